@@ -20,106 +20,542 @@ from tools.llm_tools_server import (
     combat_end,
 )
 
+import asyncio
+import atexit
+import hashlib
 import json
+import os
+import queue
+import re
+import select
 import sys
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
 from importlib import import_module
-from typing import Optional, List
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, List, Tuple
 
+try:  # optional: C-implemented JSON encoder for the pretty-printed dumps and cache keys
+    import orjson
+
+    def _jdumps(obj: Any) -> str:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+        except orjson.JSONEncodeError:
+            # e.g. non-str keys or ints beyond 64 bits, which stdlib json accepts
+            return json.dumps(obj, indent=2)
+
+    def _jkey(obj: Any) -> bytes:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+        except orjson.JSONEncodeError:
+            return json.dumps(obj, sort_keys=True).encode("utf-8")
+except Exception:  # pragma: no cover - optional dependency
+    def _jdumps(obj: Any) -> str:
+        return json.dumps(obj, indent=2)
+
+    def _jkey(obj: Any) -> bytes:
+        return json.dumps(obj, sort_keys=True).encode("utf-8")
+
+try:  # optional: line editing, history and tab completion (absent on Windows)
+    import readline
+except ImportError:  # pragma: no cover - platform dependent
+    readline = None
+
+try:  # optional: persist narrations across runs
+    import diskcache
+except Exception:  # pragma: no cover - optional dependency
+    diskcache = None
+
+
+MODEL = "dnd-writer-moe:latest"
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+
+# Free-form chat keeps at most this many messages verbatim; older ones are
+# folded into a running summary so prompt size stays flat over long sessions.
+MAX_TURNS = 12
+# ...and at most this many characters (~3K tokens), so a few long replies
+# can't push prefill time up before the turn cap kicks in.
+HISTORY_CHAR_BUDGET = 12000
+# How long Ollama keeps the model resident after each request (server default is 5m)
+KEEP_ALIVE = "30m"
 
 SYSTEM_PERSONA = (
     "You are a creative and helpful Dungeons & Dragons narrator and game master. "
     "You have access to a set of tools. Use humor where appropriate. It is important that you include maps and NPC details in your responses."
 )
 
-def _narrate_from_tile(client, tile_payload: dict, event_id: Optional[int] = None) -> None:
+# Free-form chat system prompt. Kept byte-identical across turns so Ollama can
+# reuse the KV cache for this prefix; per-turn details go after the history.
+SYSTEM_PROMPT = (
+    f"{SYSTEM_PERSONA} "
+    "Ground answers in provided tool facts when available. "
+    "Do not invent exits, items, entities, or hazards beyond provided facts."
+)
+SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT}
+
+# Tile narration system prompt, frozen for the same reason; the tile's word
+# limit and position travel in the user message instead.
+NARRATION_SYSTEM_MSG = {
+    "role": "system",
+    "content": (
+        f"{SYSTEM_PERSONA} Respect the word limit given in the user message. "
+        "Describe what the player perceives at the given position. "
+        "If an enemy is present, describe them in detail. "
+        "If an enemy is present use :spawn [name] [kind] to spawn them. "
+        "Include all Points of Interest listed. Do not invent exits, items, "
+        "entities, or hazards beyond what is provided."
+    ),
+}
+
+# Context sizes we let the server use. Ollama reloads the model whenever
+# num_ctx changes, so requests round up to one of a few fixed sizes (the
+# first matches the Modelfile) instead of sending an exact figure.
+_CTX_BUCKETS = (4096, 8192, 16384)
+
+
+def _est_tokens(messages: List[dict]) -> int:
+    """Rough prompt size; ~4 characters per token is close enough for budgeting."""
+    return sum(len(m["content"]) for m in messages) // 4
+
+
+def _gen_options(messages: List[dict], budget: int) -> dict:
+    """Ollama options sized to this request rather than the worst case."""
+    need = _est_tokens(messages) + budget + 64
+    num_ctx = next((c for c in _CTX_BUCKETS if c >= need), _CTX_BUCKETS[-1])
+    return {
+        "num_predict": budget,
+        "num_ctx": num_ctx,
+        "temperature": 0.8,
+        "stop": ["\nYou:"],
+    }
+
+
+def _tile_view(tile_payload: dict) -> dict:
+    """Flattened tile fields shared by the display, hints and narration.
+
+    Derived once and memoized on the payload, like _fmt/_hint_str.
+    """
+    view = tile_payload.get("_view")
+    if view is not None:
+        return view
+    tile = tile_payload.get("tile") or {}
+    exits = tile.get("exits") or tile_payload.get("exits") or []
+    entities = [e.get("kind") or e.get("name", "") for e in tile.get("entities") or ()]
+    items = [i.get("kind", "") for i in tile.get("items") or ()]
+    hazards = tile.get("hazards") or []
+    facts = tile_payload.get("salient_facts") or []
+
+    # Each list is joined once and shared by the brief and the POIs
+    exits_s = ", ".join(exits)
+    entities_s = ", ".join(entities)
+    items_s = ", ".join(items)
+    hazards_s = ", ".join(hazards)
+    brief = "; ".join(part for part in (
+        exits_s and f"Exits: {exits_s}",
+        entities_s and f"Entities: {entities_s}",
+        items_s and f"Items: {items_s}",
+        hazards_s and f"Hazards: {hazards_s}",
+    ) if part)
+    # Mandatory points of interest the narrative MUST include
+    points_of_interest = [*facts, *(part for part in (
+        items_s and f"Notable items present: {items_s}",
+        entities_s and f"Entities present: {entities_s}",
+        hazards_s and f"Hazards: {hazards_s}",
+    ) if part)]
+
+    view = tile_payload["_view"] = {
+        "exits": exits,
+        "entities": entities,
+        "items": items,
+        "hazards": hazards,
+        "facts": facts,
+        "brief": brief,
+        "points_of_interest": points_of_interest,
+    }
+    return view
+
+
+def _narration_request(tile_payload: dict) -> Tuple[List[dict], dict]:
+    """Build the (messages, options) pair used to narrate a tile."""
     max_words = int(tile_payload.get("max_narrative_words", 500) or 500)
-    pos = tile_payload.get("position", {})
-    tile = tile_payload.get("tile", {})
-    facts = tile_payload.get("salient_facts", [])
-    exits = ", ".join(tile.get("exits", tile_payload.get("exits", [])))
-    entities = ", ".join([e.get("kind", e.get("name", "")) for e in tile.get("entities", [])])
-    items = ", ".join([i.get("kind", "") for i in tile.get("items", [])])
-    hazards = ", ".join(tile.get("hazards", []))
-
-    brief = [
-        f"Exits: {exits}" if exits else "",
-        f"Entities: {entities}" if entities else "",
-        f"Items: {items}" if items else "",
-        f"Hazards: {hazards}" if hazards else "",
+    pos = tile_payload.get("position") or {}
+    view = _tile_view(tile_payload)
+    brief = view["brief"]
+    points_of_interest = view["points_of_interest"]
+
+    messages = [
+        NARRATION_SYSTEM_MSG,
+        {
+            "role": "user",
+            "content": "".join((
+                f"Position: {pos}. Limit this reply to about {max_words} words.\n",
+                "Environment summary: ", brief or "(none)",
+                "\nPoints of Interest (must include all):\n - ",
+                "\n - ".join(points_of_interest or ("(none)",)),
+            )),
+        },
     ]
-    brief = "; ".join([b for b in brief if b])
 
-    # Build mandatory points of interest the narrative MUST include
-    points_of_interest = []
-    for f in facts or []:
-        points_of_interest.append(f)
-    if items:
-        points_of_interest.append(f"Notable items present: {items}")
-    if entities:
-        points_of_interest.append(f"Entities present: {entities}")
-    if hazards:
-        points_of_interest.append(f"Hazards: {hazards}")
+    # Scale with what must be described, capped by the tile's word limit
+    budget = min(max_words * 2, 256 + 48 * len(points_of_interest))
+    return messages, _gen_options(messages, budget)
+
+
+async def _stream_print(stream) -> str:
+    """Echo a streamed chat reply as "DM: ..." and return the full text.
+
+    Tokens are written as they arrive so the user only waits for the first one.
+    """
+    parts: List[str] = []
+    sys.stdout.write("DM: ")
+    async for chunk in stream:
+        tok = chunk["message"]["content"]
+        sys.stdout.write(tok)
+        sys.stdout.flush()
+        parts.append(tok)
+    sys.stdout.write("\n")
+    sys.stdout.flush()
+    return "".join(parts)
+
+
+# Narrations already generated for an identical prompt, for repeat visits
+_NARR_CACHE_DIR = os.path.expanduser("~/.cache/dnd_narr")
+_NARR_TTL = 86400
+
+
+@lru_cache(maxsize=1)
+def _narration_cache():
+    if diskcache is None:
+        return None
+    try:
+        return diskcache.Cache(_NARR_CACHE_DIR)
+    except Exception:
+        return None
+
+
+def _narration_key(messages: List[dict], options: dict) -> str:
+    """Key on the prompt actually sent; volatile ids never reach it."""
+    blob = _jkey([MODEL, options["num_predict"], messages])
+    return hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+
+# The last few narrations in memory, so a repeat :look or stepping back onto
+# a tile skips the model call even without diskcache installed
+_RECENT_NARR: "OrderedDict[str, str]" = OrderedDict()
+_RECENT_NARR_MAX = 8
+
+
+def _remember_narration(key: str, text: str) -> None:
+    _RECENT_NARR[key] = text
+    _RECENT_NARR.move_to_end(key)
+    if len(_RECENT_NARR) > _RECENT_NARR_MAX:
+        _RECENT_NARR.popitem(last=False)
+
+
+# Narrative logging is a side effect; a background thread records entries so the
+# prompt comes back without waiting on it. The tool server has no batch call,
+# so each drained entry is still logged individually.
+# Entries are (session_id, text, event_id): the session is fixed when the
+# narration is queued, not whichever one is active when the worker gets to it.
+_LOG_Q: "queue.Queue[Optional[Tuple[Optional[str], str, int]]]" = queue.Queue()
+_LOG_BATCH = 32
+_log_thread: Optional[threading.Thread] = None
 
+
+def _log_worker() -> None:
+    while True:
+        batch = [_LOG_Q.get()]
+        while len(batch) < _LOG_BATCH:
+            try:
+                batch.append(_LOG_Q.get_nowait())
+            except queue.Empty:
+                break
+        for item in batch:
+            if item is not None:
+                try:
+                    logNarrative(text=item[1], eventId=item[2], sessionId=item[0])
+                except Exception:
+                    pass
+            _LOG_Q.task_done()
+        if batch[-1] is None:
+            return
+
+
+def _queue_log(session_id: Optional[str], text: str, event_id: int) -> None:
+    global _log_thread
+    if _log_thread is None:
+        _log_thread = threading.Thread(target=_log_worker, name="narrative-log", daemon=True)
+        _log_thread.start()
+        atexit.register(_drain_logs)
+    _LOG_Q.put((session_id, text, event_id))
+
+
+def _drain_logs() -> None:
+    """Stop the worker after it records everything queued so far."""
+    if _log_thread is not None and _log_thread.is_alive():
+        _LOG_Q.put(None)
+        _log_thread.join(timeout=5)
+
+
+async def _flush_logs() -> None:
+    """Wait for queued narratives to land, e.g. before reading the journal."""
+    if _log_thread is not None:
+        await asyncio.get_running_loop().run_in_executor(None, _LOG_Q.join)
+
+
+async def _narrate_from_tile(client, tile_payload: dict, event_id: Optional[int] = None) -> None:
+    messages, options = _narration_request(tile_payload)
+    cache = _narration_cache()
+    key = _narration_key(messages, options)
+    text = _RECENT_NARR.get(key)
+    if text is None and cache is not None:
+        text = cache.get(key)
+    if text is not None:
+        _remember_narration(key, text)
+        sys.stdout.write(f"DM: {text}\n")
+        sys.stdout.flush()
+    else:
+        stream = await client.chat(
+            model=MODEL,
+            messages=messages,
+            options=options,
+            stream=True,
+            keep_alive=KEEP_ALIVE,
+        )
+        text = await _stream_print(stream)
+        if text:
+            _remember_narration(key, text)
+            if cache is not None:
+                cache.set(key, text, expire=_NARR_TTL)
+    if event_id is not None:
+        _queue_log(tile_payload.get("session_id"), text, event_id)
+
+
+_TILE_MARK_RE = re.compile(r"###\s*TILE\s*(\d+)\s*###", re.I)
+
+
+async def _narrate_batch(client, tiles: List[Tuple[dict, Optional[int]]]) -> None:
+    """Narrate several queued tiles with one model call (--batch-narrate).
+
+    Each tile's brief goes in one prompt and the reply is split on the
+    ###TILE k### markers. Output is printed and logged per tile once the
+    whole reply is in, so this path doesn't stream.
+    """
+    blocks: List[str] = []
+    budget = 0
+    for k, (payload, _) in enumerate(tiles, 1):
+        msgs, opts = _narration_request(payload)
+        blocks.append(f"###TILE {k}###\n{msgs[1]['content']}")
+        budget += opts["num_predict"]
     messages = [
         {
             "role": "system",
             "content": (
-                f"{SYSTEM_PERSONA} Keep responses under {max_words} words. "
-                f"Describe what the player perceives at position {pos}. "
-                "If an enemy is present, describe them in detail."
-                "if an enemy is present use :spawn [name] [kind] to spawn them"
-                "Include all Points of Interest listed. Do not invent exits, items, "
-                "entities, or hazards beyond what is provided."
+                f"{SYSTEM_PERSONA} Include all Points of Interest listed for each tile. "
+                "Do not invent exits, items, entities, or hazards beyond what is provided."
             ),
         },
         {
             "role": "user",
             "content": (
-                "Environment summary: " + (brief if brief else "(none)") +
-                "\nPoints of Interest (must include all):\n - " + "\n - ".join(points_of_interest or [])
+                "Narrate each of the following tiles as a separate paragraph "
+                "prefixed with ###TILE k###:\n" + "\n".join(blocks)
             ),
         },
     ]
-
-    predict_tokens = int(max(256, min(3072, max_words * 2)))
-    resp = client.chat(
-        model="dnd-writer-moe:latest",
+    resp = await client.chat(
+        model=MODEL,
         messages=messages,
-        options={
-            "num_predict": predict_tokens,
-            "temperature": 0.8,
-        },
+        options=_gen_options(messages, min(budget, 4096)),
+        keep_alive=KEEP_ALIVE,
     )
-    text = resp["message"]["content"]
-    print(f"DM: {text}")
-    if event_id is not None:
+    parts = _TILE_MARK_RE.split(resp["message"]["content"])
+    # parts = [preamble, k1, text1, k2, text2, ...]
+    by_tile = {int(k): t.strip() for k, t in zip(parts[1::2], parts[2::2])}
+    if not by_tile:
+        # Model ignored the markers; show the reply whole, logged on the last move
+        text = parts[0].strip()
+        sys.stdout.write(f"DM: {text}\n")
+        sys.stdout.flush()
+        logged = [(payload, eid) for payload, eid in tiles if eid is not None]
+        if text and logged:
+            payload, eid = logged[-1]
+            _queue_log(payload.get("session_id"), text, eid)
+        return
+    for k, (payload, event_id) in enumerate(tiles, 1):
+        text = by_tile.get(k)
+        if not text:
+            continue
+        sys.stdout.write(f"DM [{k}/{len(tiles)}]: {text}\n")
+        if event_id is not None:
+            _queue_log(payload.get("session_id"), text, event_id)
+    sys.stdout.flush()
+
+
+@lru_cache(maxsize=1)
+def _ollama_client():
+    """Return the process-wide Ollama client.
+
+    One client means one keep-alive connection pool for every chat call.
+    Imported lazily so --tui users don't need the dependency.
+    """
+    import httpx
+    from ollama import AsyncClient
+
+    return AsyncClient(
+        host=OLLAMA_HOST,
+        timeout=httpx.Timeout(60.0),
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+    )
+
+
+# Touched once the model is known to exist on this server, so warm starts skip
+# the probe; removed again when the server answers 404 for the model
+_MODEL_READY = Path(tempfile.gettempdir()) / (
+    f"{MODEL.replace(':', '_').replace('/', '_')}"
+    f"-{hashlib.blake2s(OLLAMA_HOST.encode(), digest_size=6).hexdigest()}.ready"
+)
+
+
+def _forget_model_if_missing(e: BaseException) -> None:
+    """Drop the _MODEL_READY sentinel when an error says the model is gone."""
+    if getattr(e, "status_code", None) == 404:
+        try:
+            _MODEL_READY.unlink()
+        except OSError:
+            pass
+
+
+async def _ensure_model(client) -> None:
+    """Create MODEL only when the server doesn't already have it."""
+    if _MODEL_READY.exists():
+        return
+    from ollama import ResponseError
+
+    try:
+        await client.show(MODEL)  # one metadata lookup; no model load
+    except ResponseError as e:
+        if e.status_code != 404:
+            return  # server trouble; chat will surface the real error
         try:
-            logNarrative(text=text, eventId=event_id)
+            await client.create(MODEL)
         except Exception:
+            return  # no Modelfile available; same as above
+    except Exception:
+        return  # offline
+    try:
+        _MODEL_READY.touch()
+    except OSError:
+        pass
+
+
+async def _warm_up(client) -> None:
+    """Load the model and prefill the chat system prompt before the first turn.
+
+    Runs as a background task while the user reads the banner, so it stays
+    quiet unless it fails; a chat sent meanwhile just queues behind it.
+    """
+    try:
+        stream = await client.chat(
+            model=MODEL,
+            messages=[SYSTEM_MSG, {"role": "user", "content": "ok"}],
+            options={"num_predict": 1},
+            stream=True,
+            keep_alive=KEEP_ALIVE,
+        )
+        async for _ in stream:
             pass
+    except Exception as e:
+        _forget_model_if_missing(e)
+        print(f"\n⚠️  Warm-up skipped: {e}")
+
+
+_SUMMARY_FALLBACK_CHARS = 600
+
+
+def _extractive_summary(prior: Optional[str], turns: List[dict]) -> str:
+    """Cheap recap without a model call: the opening of each player turn."""
+    parts = [prior] if prior else []
+    parts.extend(m["content"][:80] for m in turns if m["role"] == "user")
+    # Keep the newest part if repeated fallbacks pile up
+    return " | ".join(parts)[-_SUMMARY_FALLBACK_CHARS:]
+
+
+async def _summarize(client, prior: Optional[str], turns: List[dict]) -> str:
+    """Condense evicted chat turns (plus any earlier summary) into a short recap.
+
+    Falls back to an extractive recap if the model call fails, so evicted
+    turns are never lost outright.
+    """
+    lines = [f"Earlier summary: {prior}"] if prior else []
+    lines.extend(f"{m['role']}: {m['content']}" for m in turns)
+    try:
+        resp = await client.chat(
+            model=MODEL,
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "Summarize this D&D conversation in under 80 words. "
+                        "Keep names, places, items, and unresolved threads."
+                    ),
+                },
+                {"role": "user", "content": "\n".join(lines)},
+            ],
+            options={"num_predict": 160, "temperature": 0.2},
+            keep_alive=KEEP_ALIVE,
+        )
+        return resp["message"]["content"].strip()
+    except Exception:
+        return _extractive_summary(prior, turns)
+
 
 def _print_tools() -> None:
     print("\n⚙️  Tools available:\n")
     print(tools_help())
 
 
-def _fmt_tile(tile_payload: dict) -> str:
+def _fmt_tile_and_grounding(tile_payload: dict) -> Tuple[str, str]:
+    """Display block and chat grounding line for a tile, built in one pass.
+
+    Both share the same exits/facts joins and are memoized on the payload,
+    which belongs to a single tile state (tool calls return fresh dicts and
+    _tile_cache is cleared whenever a tile can change).
+    """
+    cached = tile_payload.get("_fmt")
+    if cached is not None:
+        return cached, tile_payload["_grounding"]
     pos = tile_payload.get("position", {})
-    exits = ", ".join(tile_payload.get("exits", []))
-    facts = "; ".join(tile_payload.get("salient_facts", [])[:3])
+    view = _tile_view(tile_payload)
+    exits = ", ".join(view["exits"])
+    facts = "; ".join(view["facts"][:3])
     heading = tile_payload.get("heading", "?")
-    header = f"🏰 D&D Journey | {pos} facing {heading}"
-    status = f"📍 Pos {pos} | ➜ Exits: {exits}"
     facts_ln = f"📝 {facts}" if facts else "📝"
-    return f"{header}\n{status}\n{facts_ln}"
+    text = f"🏰 D&D Journey | {pos} facing {heading}\n📍 Pos {pos} | ➜ Exits: {exits}\n{facts_ln}"
+    grounding = (
+        "Narrate vividly but stay consistent with tool facts. "
+        f"Current tile exits: {exits}. Salient facts: {facts}."
+    )
+    tile_payload["_fmt"] = text
+    tile_payload["_grounding"] = grounding
+    return text, grounding
+
+
+def _fmt_tile(tile_payload: dict) -> str:
+    return _fmt_tile_and_grounding(tile_payload)[0]
 
 
 def _list_suggestions(tile_payload: Optional[dict]) -> List[str]:
     if not tile_payload:
         return [":start", ":look", ":move north", "!roll d20", ":help"]
-    exits = tile_payload.get("exits", [])
-    tile = tile_payload.get("tile", {})
-    items = [i.get("kind") for i in tile.get("items", [])]
+    view = _tile_view(tile_payload)
+    exits = view["exits"]
+    items = view["items"]
     sugg: List[str] = []
     # movement
     for d in exits[:3]:
@@ -136,23 +572,91 @@ def _list_suggestions(tile_payload: Optional[dict]) -> List[str]:
     return sugg[:6]
 
 
+_DEFAULT_HINTS = " | ".join(_list_suggestions(None))
+
+
+def _hint_str(tile_payload: Optional[dict]) -> str:
+    """Joined suggestions for a tile, memoized on the payload itself."""
+    if not tile_payload:
+        return _DEFAULT_HINTS
+    hint = tile_payload.get("_hint_str")
+    if hint is None:
+        hint = tile_payload["_hint_str"] = " | ".join(_list_suggestions(tile_payload))
+    return hint
+
+
+# Comma-separated args inside the outermost parentheses, optionally single/double quoted
+_ARG_RE = re.compile(r"""\s*(?:(['"])(.*?)\1|([^,]+?))\s*(?:,|$)""")
+
+
 def _parse_legacy_call_args(text: str) -> List[str]:
     """Parse simple function-style arguments like "('Gruk','goblin')" into ["Gruk","goblin"].
 
     This is a forgiving parser for our legacy inputs; it does not handle nested
     or escaped quotes and is intentionally simple for CLI ergonomics.
     """
-    if "(" not in text or ")" not in text:
+    # Plain find/rfind locate the outer parentheses without regex backtracking
+    i, j = text.find("("), text.rfind(")")
+    if i < 0 or j < i:
         return []
-    inner = text[text.find("(") + 1 : text.rfind(")")]
-    parts = [p.strip() for p in inner.split(",") if p.strip()]
-    cleaned: List[str] = []
-    for p in parts:
-        if (p.startswith("\"") and p.endswith("\"")) or (p.startswith("'") and p.endswith("'")):
-            cleaned.append(p[1:-1])
-        else:
-            cleaned.append(p)
-    return cleaned
+    return [quoted if quote else bare for quote, quoted, bare in _ARG_RE.findall(text, i + 1, j)]
+
+
+# Tool calls run here so the event loop keeps streaming narration meanwhile
+_EXEC = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tools")
+
+
+async def _call_tool(fn: Callable[..., dict], *args: Any, **kwargs: Any) -> dict:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_EXEC, lambda: fn(*args, **kwargs))
+
+
+# Look payloads by (session_id, position); a tile only changes through the
+# commands in _MUTATING, which clear this, so chatting in place costs a lookup.
+_tile_cache: Dict[Tuple[str, Tuple[int, int, int]], dict] = {}
+# Bumped with every clear. A look still running on an _EXEC thread (e.g. a
+# cancelled prefetch) stores its payload only if no clear happened meanwhile;
+# the lock makes that check-and-store atomic against _invalidate_tile_caches.
+_tile_cache_gen = 0
+_tile_cache_lock = threading.Lock()
+
+
+def _cached_look() -> dict:
+    active = getActiveSession()
+    sid = active.get("session_id")
+    if not sid:
+        return lookAround()  # raises the usual "no active session" error
+    pos = active["position"]
+    payload = _tile_cache.get((sid, (pos["x"], pos["y"], pos["z"])))
+    if payload is not None:
+        return payload
+    gen = _tile_cache_gen
+    payload = lookAround()
+    # Key on what lookAround actually read; the position may have moved since
+    pos = payload["position"]
+    key = (payload["session_id"], (pos["x"], pos["y"], pos["z"]))
+    with _tile_cache_lock:
+        if gen == _tile_cache_gen:
+            _tile_cache[key] = payload
+    return payload
+
+
+def _invalidate_tile_caches() -> None:
+    global _tile_cache_gen
+    with _tile_cache_lock:
+        _tile_cache_gen += 1
+        _tile_cache.clear()
+    _cached_get_npc.cache_clear()
+
+
+# NPC records don't change once spawned; lookups are per active session, so the
+# cache is cleared alongside _tile_cache by every command in _MUTATING.
+_cached_get_npc = lru_cache(maxsize=256)(getNpc)
+
+
+def _grounding(tile_payload: dict) -> str:
+    """Chat grounding line for a tile; see _fmt_tile_and_grounding."""
+    return _fmt_tile_and_grounding(tile_payload)[1]
 
 
 def _ensure_session() -> dict:
@@ -165,10 +669,11 @@ def _ensure_session() -> dict:
     return lookAround()
 
 
-def _launch_tui() -> None:
+async def _launch_tui() -> None:
     """Launch the Textual three-pane UI and return when it exits.
 
-    Imports lazily to avoid requiring Textual unless used.
+    Imports lazily to avoid requiring Textual unless used. Runs on the REPL's
+    event loop via ``run_async`` since ``App.run`` cannot nest inside it.
     """
     try:
         GameTUI = getattr(import_module("ui.tui"), "GameTUI")
@@ -176,437 +681,870 @@ def _launch_tui() -> None:
         print("❌ Unable to launch UI. Ensure Textual is installed: pip install textual")
         print(f"Reason: {e}")
         return
+    sys.stdout.flush()
     try:
-        GameTUI().run()
+        await GameTUI().run_async()
     except Exception as e:
         print(f"❌ UI error: {e}")
 
 
-def main(argv: list[str] | None = None):
-    # CLI flag to start the TUI directly
-    args = (argv if argv is not None else sys.argv[1:])
-    if any(a in {"--tui", "-u"} for a in args):
-        _launch_tui()
-        return
-    # Defer ollama import so --tui users don't need the dependency
-    import ollama
-    client = ollama.Client()
 
-    # Ensure model is ready
-    try:
-        client.create("dnd-writer-moe:latest")
-    except:
-        pass
 
-    print(
-        ">> Commands: :start, :end, :reset, :move <dir>, :look, :spawn [name] [kind], :npc <id>, :journal, :sessions, :use <id>, :tools, :help, :hints on|off, :suggest, :ui\n"
-        ">> Combat: :generate encounter | :attack \"weapon\" \"NdM\" [adv|dis] | :combat status | :combat end\n"
-        ">> Prefer colon commands. Legacy function calls like spawnNpc('Gruk','goblin') are supported but normalized.\n"
-        ">> Aliases: 'go <dir>', 'move <dir>', 'look' (same as :look).\n"
-        ">> Dice: '!roll XdY', '!roll-a dY'. Chat free-form for narrative. 'exit' to quit.\n"
-        ">> UI: ':ui' to launch the three-pane interface, or run: python -m ui.tui"
-    )
-    _print_tools()
-    _ensure_session()
-    history = []  # keep track of conversation for context
+class ChatHistory:
+    """Chat turns stored as parallel role/content lists.
+
+    ``messages`` holds the matching {"role","content"} dicts so a request can
+    splice them in directly. Trimming only needs the content lengths, so it
+    sums a plain list instead of walking dicts.
+    """
+
+    __slots__ = ("roles", "contents", "messages", "chars")
+
+    def __init__(self) -> None:
+        self.roles: List[str] = []
+        self.contents: List[str] = []
+        self.messages: List[dict] = []
+        self.chars = 0
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    def push(self, role: str, content: str) -> None:
+        self.roles.append(role)
+        self.contents.append(content)
+        self.messages.append({"role": role, "content": content})
+        self.chars += len(content)
+
+    def evict(self, max_turns: int, char_budget: int) -> List[dict]:
+        """Drop the oldest turns until both caps hold; return them.
+
+        The newest message always stays, however long it is.
+        """
+        n = len(self.contents)
+        k = max(0, n - max_turns)
+        chars = self.chars - sum(map(len, self.contents[:k]))
+        while k < n - 1 and chars > char_budget:
+            chars -= len(self.contents[k])
+            k += 1
+        if not k:
+            return []
+        evicted = self.messages[:k]
+        del self.roles[:k], self.contents[:k], self.messages[:k]
+        self.chars = chars
+        return evicted
+
+
+@dataclass
+class ReplState:
+    """Mutable REPL state shared by the command handlers."""
+
+    client: Any
+    merge_narration: bool = False
+    # Conversation for context, trimmed by _chat to MAX_TURNS / HISTORY_CHAR_BUDGET
+    history: "ChatHistory" = field(default_factory=lambda: ChatHistory())
+    # Running recap of turns evicted from history, refreshed in the background
+    summary: Optional[str] = None
+    summary_task: Optional[asyncio.Task] = None
+    summary_msg: Optional[dict] = None
+    unsummarized: List[dict] = field(default_factory=list)
     last_tile: Optional[dict] = None
     hints_enabled: bool = True
     last_d20_roll: Optional[int] = None
+    # Narrations run in the background so the model can generate while the user types
+    pending: set = field(default_factory=set)
+    staged: Optional[Tuple[dict, Optional[int]]] = None  # (tile payload, event id) awaiting narration
+    # --batch-narrate N: staged tiles queue here and are narrated N per model call
+    batch_size: int = 0
+    pending_tiles: List[Tuple[dict, Optional[int]]] = field(default_factory=list)
+    # Read-only commands still in flight; settled before anything that depends on order
+    background: set = field(default_factory=set)
+    # Speculative lookAround() started after a move; :look usually follows
+    prefetched_look: Optional[asyncio.Task] = None
+    # Per-turn context message, rewritten only when the word limit or tile changes
+    ctx_msg: dict = field(default_factory=lambda: {"role": "system", "content": ""})
+    ctx_key: Optional[Tuple[int, str]] = None
+    # Moving average of chat reply length in tokens, used to size num_predict
+    reply_ema: float = 400.0
+    # Input lines read ahead from piped stdin, consumed one per loop pass
+    queued: deque = field(default_factory=deque)
 
-    while True:
-        text = input("You: ").strip()
-        if text.lower() in ("quit", "exit"):
-            break
 
-        if text.startswith(":tools"):
-            _print_tools()
-            continue
+def _prefetch_look(state: ReplState) -> None:
+    _drop_prefetch(state)
+    state.prefetched_look = asyncio.create_task(_call_tool(_cached_look))
 
-        if text.startswith(":help"):
-            print(
-                "\nCommands:\n"
-                ":start | :end | :reset | :move <north|south|east|west|up|down|forward|back|left|right> | :look | :spawn [name] [kind] | :npc <id> | :journal | :sessions | :use <id> | :tools | :help | :hints on|off | :suggest | :ui\n"
-                "Combat: :generate encounter | :attack \"weapon\" \"NdM\" [adv|dis] | :combat status | :combat end\n"
-                "Aliases: 'go <dir>', 'move <dir>', 'look'.\n"
-                "Examples: go west | :move forward | :spawn Gruk goblin | !roll d20\n"
-            )
-        if text.startswith(":generate encounter") or text.startswith(":generate encouter"):
-            # Allow optional name/kind: :generate encounter [name] [kind]
-            parts = text.split()
-            name = parts[2] if len(parts) > 2 else None
-            kind = parts[3] if len(parts) > 3 else None
-            payload = generate_encounter(name=name, kind=kind)
-            print("🧨 Encounter generated")
-            if "message" in payload:
-                print(payload["message"])
-            print(_fmt_tile(payload))
-            last_tile = payload
-            _narrate_from_tile(client, payload, event_id=payload.get("event_id"))
-            continue
 
-        if text.startswith(":combat "):
-            sub = text.split(" ", 1)[1].strip().lower()
-            if sub == "status":
-                res = combat_status()
-                print("⚔️  Combat status:")
-                print(json.dumps(res, indent=2))
-                continue
-            if sub == "end":
-                res = combat_end()
-                print(res.get("message", "The battle is finished."))
-                continue
-            print("❌ Usage: :combat status | :combat end")
-            continue
+def _drop_prefetch(state: ReplState) -> None:
+    task, state.prefetched_look = state.prefetched_look, None
+    if task is not None:
+        if task.done() and not task.cancelled():
+            task.exception()  # mark retrieved; a stale failure is irrelevant
+        task.cancel()
 
-        if text.startswith(":attack"):
-            # :attack "weapon" "2d6" [adv|dis]
-            try:
-                arg = text[len(":attack"):].strip()
-                weapon = "attack"
-                dmg = "1d6"
-                adv = False
-                dis = False
-                use_player_roll: Optional[int] = None
-                # naive quoted parse
-                if arg.startswith("\""):
-                    second = arg.find("\"", 1)
-                    weapon = arg[1:second]
-                    rest = arg[second+1:].strip()
-                else:
-                    parts = arg.split()
-                    weapon = parts[0] if parts else weapon
-                    rest = " ".join(parts[1:]) if len(parts) > 1 else ""
-                if rest.startswith("\""):
-                    second = rest.find("\"", 1)
-                    dmg = rest[1:second]
-                    rest2 = rest[second+1:].strip()
-                else:
-                    p2 = rest.split()
-                    if p2:
-                        dmg = p2[0]
-                    rest2 = " ".join(p2[1:]) if len(p2) > 1 else ""
-                flag = (rest2 or "").strip().lower()
-                if flag in {"adv", "advantage"}:
-                    adv = True
-                if flag in {"dis", "disadvantage"}:
-                    dis = True
-                # If user rolled d20 just before and no adv/dis provided, reuse that roll
-                if (not adv and not dis) and last_d20_roll is not None:
-                    use_player_roll = last_d20_roll
-                payload = tool_attack(weapon=weapon, damage=dmg, advantage=adv, disadvantage=dis, player_roll=use_player_roll)
-                print("🗡️  Attack:")
-                print(payload.get("message", ""))
-                if "combat" in payload:
-                    print("⚔️  Enemies:")
-                    print(json.dumps(payload["combat"], indent=2))
-                last_tile = payload
-                continue
-            except Exception as e:
-                print(f"❌ {e}")
-                continue
-            continue
 
-        if text.startswith(":hints"):
-            arg = text.split(" ", 1)[1].strip().lower() if " " in text else ""
-            if arg in {"on", "off"}:
-                hints_enabled = arg == "on"
-                print(f"💡 Hints {'enabled' if hints_enabled else 'disabled'}")
-            else:
-                print(f"💡 Hints are {'on' if hints_enabled else 'off'} — use :hints on|off")
-            continue
+def _start_narration(state: ReplState) -> None:
+    """Narrate the staged tile on a background task."""
+    task = asyncio.create_task(_narrate_from_tile(state.client, *state.staged))
+    state.staged = None
+    state.pending.add(task)
+    task.add_done_callback(lambda t: _narration_done(state, t))
 
-        if text.startswith(":suggest"):
-            suggestions = _list_suggestions(last_tile)
-            if suggestions:
-                print("👉 Try:", " | ".join(suggestions))
-            continue
 
-        if text.startswith(":ui"):
-            _launch_tui()
-            continue
+def _flush_batch(state: ReplState) -> None:
+    """Narrate any queued tiles now, even if the batch isn't full."""
+    if not state.pending_tiles:
+        return
+    tiles, state.pending_tiles = state.pending_tiles, []
+    task = asyncio.create_task(_narrate_batch(state.client, tiles))
+    state.pending.add(task)
+    task.add_done_callback(lambda t: _narration_done(state, t))
 
-        # --- Legacy function-style inputs; normalize to colon commands ---
-        lower = text.lower()
-        if lower.startswith("spawnnpc("):
-            args = _parse_legacy_call_args(text)
-            name = args[0] if len(args) > 0 else None
-            kind = args[1] if len(args) > 1 else None
-            res = spawnNpc(name=name, kind=kind)
-            npc = res["npc"]
-            print(f"⚔️  Spawned {npc['name']} (id={npc['id']}, kind={npc['kind']}, AC={npc['armor_class']})")
-            print(res["message"])
-            if hints_enabled and last_tile:
-                print("👉 Try:", " | ".join(_list_suggestions(last_tile)))
-            continue
-        if lower.startswith("generateencounter("):
-            args = _parse_legacy_call_args(text)
-            name = args[0] if len(args) > 0 else None
-            kind = args[1] if len(args) > 1 else None
-            payload = generate_encounter(name=name, kind=kind)
-            print("🧨 Encounter generated")
-            if "message" in payload:
-                print(payload["message"])
-            print(_fmt_tile(payload))
-            last_tile = payload
-            _narrate_from_tile(client, payload, event_id=payload.get("event_id"))
-            continue
-        if lower.startswith("attack("):
-            args = _parse_legacy_call_args(text)
-            weapon = args[0] if len(args) > 0 else "attack"
-            dmg = args[1] if len(args) > 1 else "1d6"
-            flag = (args[2].lower() if len(args) > 2 else "")
-            adv = flag in {"adv", "advantage"}
-            dis = flag in {"dis", "disadvantage"}
-            try:
-                payload = tool_attack(weapon=weapon, damage=dmg, advantage=adv, disadvantage=dis)
-                print("🗡️  Attack:")
-                print(payload.get("message", ""))
-                if "combat" in payload:
-                    print("⚔️  Enemies:")
-                    print(json.dumps(payload["combat"], indent=2))
-                last_tile = payload
-            except Exception as e:
-                print(f"❌ {e}")
-            continue
-        if lower.startswith("combatstatus(") or lower == "combatstatus":
-            try:
-                res = combat_status()
-                print("⚔️  Combat status:")
-                print(json.dumps(res, indent=2))
-            except Exception as e:
-                print(f"❌ {e}")
-            continue
-        if lower.startswith("combatend(") or lower == "combatend":
-            try:
-                res = combat_end()
-                print(res.get("message", "The battle is finished."))
-            except Exception as e:
-                print(f"❌ {e}")
-            continue
-        if lower.startswith("movedir("):
-            args = _parse_legacy_call_args(text)
-            direction = args[0] if args else ""
-            if direction:
-                payload = moveDir(direction)
-                print(f"🧭 Move: {direction} → event {payload.get('event_id')}")
-                print(_fmt_tile(payload))
-                last_tile = payload
-                _narrate_from_tile(client, payload, event_id=payload.get("event_id"))
-                if hints_enabled:
-                    print("👉 Try:", " | ".join(_list_suggestions(last_tile)))
-                continue
-        if lower.startswith("lookaround("):
-            payload = lookAround()
-            print("👀 Look:")
-            print(_fmt_tile(payload))
-            last_tile = payload
-            _narrate_from_tile(client, payload)
-            if hints_enabled:
-                print("👉 Try:", " | ".join(_list_suggestions(last_tile)))
-            continue
-        if lower.startswith("startsession(") or lower == "startsession":
-            payload = startSession()
-            print(f"✅ Session started: {payload['session_id']}")
-            print(_fmt_tile(payload))
-            last_tile = payload
-            continue
 
-        if text.startswith(":start"):
-            payload = startSession()
-            print(f"✅ Session started: {payload['session_id']}")
-            print(_fmt_tile(payload))
-            last_tile = payload
-            continue
+def _narration_done(state: ReplState, task: asyncio.Task) -> None:
+    state.pending.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        _forget_model_if_missing(task.exception())
+        print(f"❌ Narration failed: {task.exception()}")
+
+
+async def _await_pending(state: ReplState) -> None:
+    """Wait for background narrations to finish before output that follows them."""
+    if state.pending:
+        await asyncio.wait(set(state.pending))
+
+
+# Word sets for command arguments, shared by the colon and legacy forms
+_ADV = frozenset({"adv", "advantage"})
+_DIS = frozenset({"dis", "disadvantage"})
+_ONOFF = frozenset({"on", "off"})
+_ENCOUNTER_WORDS = frozenset({"encounter", "encouter"})
+_QUIT = frozenset({"quit", "exit"})
+
+
+# ---------- Shared command bodies ----------
+
+async def _do_move(state: ReplState, direction: str) -> dict:
+    payload = await _call_tool(moveDir, direction)
+    _prefetch_look(state)
+    state.last_tile = payload
+    state.staged = (payload, payload.get("event_id"))
+    # One write per block, so a narration streaming meanwhile can't split it
+    hint = f"👉 Try: {_hint_str(payload)}\n" if state.hints_enabled else ""
+    sys.stdout.write(f"🧭 Move: {direction} → event {payload.get('event_id')}\n{_fmt_tile(payload)}\n{hint}")
+    return payload
+
+
+async def _take_look(state: ReplState) -> dict:
+    """Use the prefetched lookAround() result when still valid, else call live."""
+    task, state.prefetched_look = state.prefetched_look, None
+    if task is not None:
+        try:
+            return await task
+        except Exception:
+            pass  # fall back to a live call below
+    return await _call_tool(_cached_look)
+
+
+async def _do_look(state: ReplState) -> dict:
+    payload = await _take_look(state)
+    state.last_tile = payload
+    state.staged = (payload, None)
+    hint = f"👉 Try: {_hint_str(payload)}\n" if state.hints_enabled else ""
+    sys.stdout.write(f"👀 Look:\n{_fmt_tile(payload)}\n{hint}")
+    return payload
+
+
+async def _do_spawn(state: ReplState, name: Optional[str], kind: Optional[str]) -> dict:
+    res = await _call_tool(spawnNpc, name=name, kind=kind)
+    npc = res["npc"]
+    print(f"⚔️  Spawned {npc['name']} (id={npc['id']}, kind={npc['kind']}, AC={npc['armor_class']})")
+    print(res["message"])
+    if state.hints_enabled and state.last_tile:
+        print("👉 Try:", _hint_str(state.last_tile))
+    return res
+
+
+def _do_encounter(state: ReplState, name: Optional[str], kind: Optional[str]) -> dict:
+    payload = generate_encounter(name=name, kind=kind)
+    print("🧨 Encounter generated")
+    if "message" in payload:
+        print(payload["message"])
+    print(_fmt_tile(payload))
+    state.last_tile = payload
+    state.staged = (payload, payload.get("event_id"))
+    return payload
+
+
+def _do_attack(
+    state: ReplState,
+    weapon: str,
+    dmg: str,
+    adv: bool = False,
+    dis: bool = False,
+    player_roll: Optional[int] = None,
+) -> dict:
+    payload = tool_attack(weapon=weapon, damage=dmg, advantage=adv, disadvantage=dis, player_roll=player_roll)
+    print("🗡️  Attack:")
+    print(payload.get("message", ""))
+    if "combat" in payload:
+        print("⚔️  Enemies:")
+        print(_jdumps(payload["combat"]))
+    state.last_tile = payload
+    return payload
+
+
+# ---------- Colon commands and natural aliases ----------
+
+async def _cmd_tools(arg: str, state: ReplState) -> None:
+    _print_tools()
+
+
+async def _cmd_help(arg: str, state: ReplState) -> None:
+    print(
+        "\nCommands:\n"
+        ":start | :end | :reset | :move <north|south|east|west|up|down|forward|back|left|right> | :look | :spawn [name] [kind] | :npc <id> | :journal | :sessions | :use <id> | :tools | :help | :hints on|off | :suggest | :ui\n"
+        "Combat: :generate encounter | :attack \"weapon\" \"NdM\" [adv|dis] | :combat status | :combat end\n"
+        "Aliases: 'go <dir>', 'move <dir>', 'look'.\n"
+        "Examples: go west | :move forward | :spawn Gruk goblin | !roll d20\n"
+    )
+
+
+async def _cmd_generate(arg: str, state: ReplState) -> None:
+    # Allow optional name/kind: :generate encounter [name] [kind]
+    parts = arg.split()
+    if not parts or parts[0].lower() not in _ENCOUNTER_WORDS:
+        print("❌ Usage: :generate encounter [name] [kind]")
+        return
+    name = parts[1] if len(parts) > 1 else None
+    kind = parts[2] if len(parts) > 2 else None
+    _do_encounter(state, name, kind)
+
+
+async def _cmd_combat(arg: str, state: ReplState) -> None:
+    sub = arg.lower()
+    if sub == "status":
+        res = combat_status()
+        print("⚔️  Combat status:")
+        print(_jdumps(res))
+        return
+    if sub == "end":
+        res = combat_end()
+        print(res.get("message", "The battle is finished."))
+        return
+    print("❌ Usage: :combat status | :combat end")
+
+
+async def _cmd_attack(arg: str, state: ReplState) -> None:
+    # :attack "weapon" "2d6" [adv|dis]
+    weapon = "attack"
+    dmg = "1d6"
+    adv = False
+    dis = False
+    use_player_roll: Optional[int] = None
+    # naive quoted parse
+    if arg.startswith("\""):
+        second = arg.find("\"", 1)
+        weapon = arg[1:second]
+        rest = arg[second+1:].strip()
+    else:
+        parts = arg.split()
+        weapon = parts[0] if parts else weapon
+        rest = " ".join(parts[1:]) if len(parts) > 1 else ""
+    if rest.startswith("\""):
+        second = rest.find("\"", 1)
+        dmg = rest[1:second]
+        rest2 = rest[second+1:].strip()
+    else:
+        p2 = rest.split()
+        if p2:
+            dmg = p2[0]
+        rest2 = " ".join(p2[1:]) if len(p2) > 1 else ""
+    flag = (rest2 or "").strip().lower()
+    if flag in _ADV:
+        adv = True
+    if flag in _DIS:
+        dis = True
+    # If user rolled d20 just before and no adv/dis provided, reuse that roll
+    if (not adv and not dis) and state.last_d20_roll is not None:
+        use_player_roll = state.last_d20_roll
+    _do_attack(state, weapon, dmg, adv, dis, use_player_roll)
+
+
+async def _cmd_hints(arg: str, state: ReplState) -> None:
+    val = arg.lower()
+    if val in _ONOFF:
+        state.hints_enabled = val == "on"
+        print(f"💡 Hints {'enabled' if state.hints_enabled else 'disabled'}")
+    else:
+        print(f"💡 Hints are {'on' if state.hints_enabled else 'off'} — use :hints on|off")
+
+
+async def _cmd_suggest(arg: str, state: ReplState) -> None:
+    print("👉 Try:", _hint_str(state.last_tile))
+
+
+async def _cmd_ui(arg: str, state: ReplState) -> None:
+    await _launch_tui()
+
 
-        if text.startswith(":end"):
-            active = getActiveSession()
-            sid = active.get("session_id")
-            if not sid:
-                print("ℹ️  No active session")
+async def _cmd_start(arg: str, state: ReplState) -> None:
+    payload = startSession()
+    print(f"✅ Session started: {payload['session_id']}")
+    print(_fmt_tile(payload))
+    state.last_tile = payload
+
+
+async def _cmd_end(arg: str, state: ReplState) -> None:
+    active = getActiveSession()
+    sid = active.get("session_id")
+    if not sid:
+        print("ℹ️  No active session")
+    else:
+        res = endSession(sid)
+        print(f"🛑 Ended session: {res.get('ended')}")
+    state.last_tile = None
+
+
+async def _cmd_reset(arg: str, state: ReplState) -> None:
+    resetAll()
+    print("🧹 Reset all sessions")
+    state.last_tile = None
+
+
+async def _cmd_move(arg: str, state: ReplState) -> None:
+    direction = arg
+    if not direction:
+        print("❌ Usage: :move <dir>")
+        return
+    await _do_move(state, direction)
+
+
+async def _cmd_look(arg: str, state: ReplState) -> None:
+    await _do_look(state)
+
+
+async def _cmd_spawn(arg: str, state: ReplState) -> None:
+    parts = arg.split()
+    name: Optional[str] = parts[0] if len(parts) > 0 else None
+    kind: Optional[str] = parts[1] if len(parts) > 1 else None
+    await _do_spawn(state, name, kind)
+
+
+async def _cmd_npc(arg: str, state: ReplState) -> None:
+    npc_id = arg
+    if not npc_id:
+        print("❌ Usage: :npc <id>")
+        return
+    res = await _call_tool(_cached_get_npc, npc_id)
+    print("📇 NPC:")
+    print(_jdumps(res["npc"]))
+
+
+async def _cmd_journal(arg: str, state: ReplState) -> None:
+    await _flush_logs()
+    res = await _call_tool(journalSummary)
+    # Runs in the background, so the whole block goes out in one write
+    sys.stdout.write("📜 Journal:\n" + "".join(f" - {ln}\n" for ln in res.get("summary", [])))
+
+
+async def _cmd_sessions(arg: str, state: ReplState) -> None:
+    res = await _call_tool(listSessions)
+    sys.stdout.write("🗂️  Sessions:\n" + "".join(
+        f" {'*' if s.get('active') else ' '} {s['session_id']} @ {s['position']} turn={s['turn']} heading={s['heading']}\n"
+        for s in res.get("sessions", [])
+    ))
+
+
+async def _cmd_use(arg: str, state: ReplState) -> None:
+    sid = arg
+    if not sid:
+        print("❌ Usage: :use <id>")
+        return
+    setActiveSession(sid)
+    print(f"✅ Active session set: {sid}")
+
+
+async def _cmd_roll(arg: str, state: ReplState) -> None:
+    notation = arg
+    try:
+        result = roll_dice(notation)
+        print(
+            f"Dice: {result['notation']} → rolls={result['rolls']}, total={result['total']}"
+        )
+        # Track last d20 for combat hit checks
+        try:
+            if result.get("count") == 1 and result.get("sides") == 20:
+                state.last_d20_roll = int(result.get("total"))
             else:
-                res = endSession(sid)
-                print(f"🛑 Ended session: {res.get('ended')}")
-            last_tile = None
-            continue
+                state.last_d20_roll = None
+        except Exception:
+            state.last_d20_roll = None
+        if state.hints_enabled and state.last_tile:
+            print("👉 Try:", _hint_str(state.last_tile))
+    except Exception as e:
+        print(f"❌ {e}. Try '!roll 1d20' or '!roll 2d6'.")
 
-        if text.startswith(":reset"):
-            resetAll()
-            print("🧹 Reset all sessions")
-            last_tile = None
-            continue
 
-        if text.startswith(":move "):
-            direction = text.split(" ", 1)[1].strip()
-            payload = moveDir(direction)
-            print(f"🧭 Move: {direction} → event {payload.get('event_id')}")
-            print(_fmt_tile(payload))
-            last_tile = payload
-            _narrate_from_tile(client, payload, event_id=payload.get("event_id"))
-            if hints_enabled:
-                print("👉 Try:", " | ".join(_list_suggestions(last_tile)))
-            continue
+async def _cmd_roll_a(arg: str, state: ReplState) -> None:
+    notation = arg
+    try:
+        adv = roll_with_advantage(notation)
+        msg = f" — {adv['message']}" if adv.get("message") else ""
+        print(
+            f"Advantage: {adv['notation']} → rolls={adv['rolls']}, result={adv['result']}{msg}"
+        )
+        # Advantage not tracked for d20 reuse
+        if state.hints_enabled and state.last_tile:
+            print("👉 Try:", _hint_str(state.last_tile))
+    except Exception as e:
+        print(f"❌ {e}. Try '!roll-a d20'.")
 
-        if text.startswith(":look"):
-            payload = lookAround()
-            print("👀 Look:")
-            print(_fmt_tile(payload))
-            last_tile = payload
-            _narrate_from_tile(client, payload)
-            if hints_enabled:
-                print("👉 Try:", " | ".join(_list_suggestions(last_tile)))
-            continue
 
-        if text.startswith(":spawn") or text.lower().startswith("spawn "):
-            parts = text.split()
-            name: Optional[str] = parts[1] if len(parts) > 1 else None
-            kind: Optional[str] = parts[2] if len(parts) > 2 else None
-            res = spawnNpc(name=name, kind=kind)
-            npc = res["npc"]
-            print(f"⚔️  Spawned {npc['name']} (id={npc['id']}, kind={npc['kind']}, AC={npc['armor_class']})")
-            print(res["message"])
-            continue
+# Keyed by the first whitespace-separated token, lowercased
+COMMANDS: Dict[str, Callable[[str, ReplState], Awaitable[None]]] = {
+    ":tools": _cmd_tools,
+    ":help": _cmd_help,
+    ":generate": _cmd_generate,
+    ":combat": _cmd_combat,
+    ":attack": _cmd_attack,
+    ":hints": _cmd_hints,
+    ":suggest": _cmd_suggest,
+    ":ui": _cmd_ui,
+    ":start": _cmd_start,
+    ":end": _cmd_end,
+    ":reset": _cmd_reset,
+    ":move": _cmd_move,
+    "move": _cmd_move,
+    "go": _cmd_move,
+    ":look": _cmd_look,
+    ":spawn": _cmd_spawn,
+    "spawn": _cmd_spawn,
+    ":npc": _cmd_npc,
+    ":journal": _cmd_journal,
+    ":sessions": _cmd_sessions,
+    ":use": _cmd_use,
+    ":roll": _cmd_roll,
+    "!roll": _cmd_roll,
+    "!roll-a": _cmd_roll_a,
+}
 
-        if text.startswith(":npc "):
-            npc_id = text.split(" ", 1)[1].strip()
-            try:
-                res = getNpc(npc_id)
-                print("📇 NPC:")
-                print(json.dumps(res["npc"], indent=2))
-            except Exception as e:
-                print(f"❌ {e}")
-            continue
+# Exact-match phrases; "look at the goblin" stays free-form chat
+_LOOK_ALIASES = frozenset({"look", "look around"})
 
-        if text.startswith(":journal"):
-            res = journalSummary()
-            print("📜 Journal:")
-            for ln in res.get("summary", []):
-                print(f" - {ln}")
-            continue
 
-        if text.startswith(":sessions"):
-            res = listSessions()
-            print("🗂️  Sessions:")
-            for s in res.get("sessions", []):
-                mark = "*" if s.get("active") else " "
-                print(f" {mark} {s['session_id']} @ {s['position']} turn={s['turn']} heading={s['heading']}")
-            continue
+# ---------- Legacy function-style inputs; normalized to colon commands ----------
 
-        if text.startswith(":use "):
-            sid = text.split(" ", 1)[1].strip()
-            try:
-                setActiveSession(sid)
-                print(f"✅ Active session set: {sid}")
-            except Exception as e:
-                print(f"❌ {e}")
-            continue
+async def _legacy_spawnnpc(text: str, state: ReplState) -> None:
+    args = _parse_legacy_call_args(text)
+    name = args[0] if len(args) > 0 else None
+    kind = args[1] if len(args) > 1 else None
+    await _do_spawn(state, name, kind)
 
-        if text.startswith(":roll ") or text.startswith("!roll "):
-            notation = text.split(" ", 1)[1].strip()
-            try:
-                result = roll_dice(notation)
-                print(
-                    f"Dice: {result['notation']} → rolls={result['rolls']}, total={result['total']}"
-                )
-                # Track last d20 for combat hit checks
-                try:
-                    if result.get("count") == 1 and result.get("sides") == 20:
-                        last_d20_roll = int(result.get("total"))
-                    else:
-                        last_d20_roll = None
-                except Exception:
-                    last_d20_roll = None
-                if hints_enabled and last_tile:
-                    print("👉 Try:", " | ".join(_list_suggestions(last_tile)))
-            except Exception as e:
-                print(f"❌ {e}. Try '!roll 1d20' or '!roll 2d6'.")
-            continue
 
-        if text.startswith("!roll-a "):
-            notation = text.split(" ", 1)[1].strip()
-            try:
-                adv = roll_with_advantage(notation)
-                msg = f" — {adv['message']}" if adv.get("message") else ""
-                print(
-                    f"Advantage: {adv['notation']} → rolls={adv['rolls']}, result={adv['result']}{msg}"
-                )
-                # Advantage not tracked for d20 reuse
-                if hints_enabled and last_tile:
-                    print("👉 Try:", " | ".join(_list_suggestions(last_tile)))
-            except Exception as e:
-                print(f"❌ {e}. Try '!roll-a d20'.")
-            continue
+async def _legacy_generateencounter(text: str, state: ReplState) -> None:
+    args = _parse_legacy_call_args(text)
+    name = args[0] if len(args) > 0 else None
+    kind = args[1] if len(args) > 1 else None
+    _do_encounter(state, name, kind)
 
-        # Natural language command aliases (no colon)
-        if text.lower().startswith("go ") or text.lower().startswith("move "):
-            direction = text.split(" ", 1)[1].strip()
-            payload = moveDir(direction)
-            print(f"🧭 Move: {direction} → event {payload.get('event_id')}")
-            print(_fmt_tile(payload))
-            last_tile = payload
-            _narrate_from_tile(client, payload, event_id=payload.get("event_id"))
-            if hints_enabled:
-                print("👉 Try:", " | ".join(_list_suggestions(last_tile)))
-            continue
 
-        if text.lower() in {"look", "look around"}:
-            payload = lookAround()
-            print("👀 Look:")
-            print(_fmt_tile(payload))
-            last_tile = payload
-            _narrate_from_tile(client, payload)
-            if hints_enabled:
-                print("👉 Try:", " | ".join(_list_suggestions(last_tile)))
-            continue
+async def _legacy_attack(text: str, state: ReplState) -> None:
+    args = _parse_legacy_call_args(text)
+    weapon = args[0] if len(args) > 0 else "attack"
+    dmg = args[1] if len(args) > 1 else "1d6"
+    flag = (args[2].lower() if len(args) > 2 else "")
+    adv = flag in _ADV
+    dis = flag in _DIS
+    _do_attack(state, weapon, dmg, adv, dis)
+
+
+async def _legacy_combatstatus(text: str, state: ReplState) -> None:
+    await _cmd_combat("status", state)
+
+
+async def _legacy_combatend(text: str, state: ReplState) -> None:
+    await _cmd_combat("end", state)
+
+
+async def _legacy_movedir(text: str, state: ReplState) -> None:
+    args = _parse_legacy_call_args(text)
+    direction = args[0] if args else ""
+    if not direction:
+        print("❌ Usage: moveDir('<dir>')")
+        return
+    await _do_move(state, direction)
+
+
+async def _legacy_lookaround(text: str, state: ReplState) -> None:
+    await _do_look(state)
+
+
+# Legacy calls share the command table. "name(" keys receive the raw input so
+# they can parse their own argument list; bare names need no arguments.
+COMMANDS.update({
+    "spawnnpc(": _legacy_spawnnpc,
+    "generateencounter(": _legacy_generateencounter,
+    "attack(": _legacy_attack,
+    "combatstatus(": _legacy_combatstatus,
+    "combatstatus": _legacy_combatstatus,
+    "combatend(": _legacy_combatend,
+    "combatend": _legacy_combatend,
+    "movedir(": _legacy_movedir,
+    "lookaround(": _legacy_lookaround,
+    "startsession(": _cmd_start,
+    "startsession": _cmd_start,
+})
+
+
+# Handlers that change session or tile state and so void a prefetched look
+_MUTATING = {
+    _cmd_generate, _cmd_combat, _cmd_attack, _cmd_start, _cmd_end, _cmd_reset,
+    _cmd_move, _cmd_spawn, _cmd_use,
+    _legacy_spawnnpc, _legacy_generateencounter, _legacy_attack,
+    _legacy_combatend, _legacy_movedir,
+}
+
+
+# Read-only lookups that run as background tasks so several can overlap each
+# other and any streaming narration. Their output prints when each finishes.
+_MOVES = frozenset({_cmd_move, _legacy_movedir})
+# Commands that change or remove the active session
+_SESSION_SWITCHES = frozenset({_cmd_start, _cmd_end, _cmd_reset, _cmd_use})
+_BACKGROUND = {_cmd_npc, _cmd_journal, _cmd_sessions}
+
+
+async def _run_handler(handler: Callable[[str, ReplState], Awaitable[None]], arg: str, state: ReplState) -> None:
+    try:
+        await handler(arg, state)
+    except Exception as e:
+        print(f"❌ {e}")
+
+
+async def _settle_background(state: ReplState) -> None:
+    """Wait for queued read-only commands, e.g. before a chat turn or a mutation."""
+    if state.background:
+        await asyncio.gather(*state.background)
+
 
-        # append to history and send full conversation each time
-        history.append({"role":"user","content":text})
-        # Insert system prompts; ground only if we have a cached tile from explicit tool calls
-        grounding = ""
-        if last_tile:
-            grounding = (
-                "Narrate vividly but stay consistent with tool facts. Current tile exits: "
-                + ", ".join(last_tile.get("exits", []))
-                + ". Salient facts: "
-                + "; ".join(last_tile.get("salient_facts", [])[:3])
-                + "."
-            )
-        max_words = 300
-        if last_tile and isinstance(last_tile.get("max_narrative_words"), int):
-            max_words = int(last_tile["max_narrative_words"]) or 500
-        messages = [{
+# Quick commands that may run while a narration is still streaming (:journal
+# isn't one: it should include the narration being written)
+_NO_WAIT = {_cmd_roll, _cmd_roll_a, _cmd_hints, _cmd_suggest, _cmd_tools, _cmd_help, _cmd_npc, _cmd_sessions}
+
+
+def _resolve(text: str) -> Optional[Tuple[Callable[[str, ReplState], Awaitable[None]], str]]:
+    """Map input to (handler, argument), or None when it is free-form chat."""
+    head, _, arg = text.partition(" ")
+    fn = COMMANDS.get(head.lower())
+    if fn is not None:
+        return fn, arg.strip()
+    lower = text.lower()
+    if lower in _LOOK_ALIASES:
+        return _cmd_look, ""
+    name, paren, _ = lower.partition("(")
+    if paren:
+        fn = COMMANDS.get(name.strip() + paren)
+        if fn is not None:
+            return fn, text
+    return None
+
+
+async def _chat(text: str, state: ReplState) -> None:
+    """Free-form turn: send the conversation to the model and stream the reply."""
+    client = state.client
+    history = state.history
+    last_tile = state.last_tile
+    # append to history and send full conversation each time
+    history.push("user", text)
+    state.unsummarized.extend(history.evict(MAX_TURNS, HISTORY_CHAR_BUDGET))
+    # Insert system prompts; ground only once explicit tool calls have shown a
+    # tile, using the look fetched while the user was typing so it is current
+    ground_tile = None
+    if last_tile:
+        try:
+            ground_tile = await _take_look(state)
+        except Exception:
+            ground_tile = last_tile
+    grounding = _grounding(ground_tile) if ground_tile else ""
+    max_words = 300
+    if ground_tile and isinstance(ground_tile.get("max_narrative_words"), int):
+        max_words = int(ground_tile["max_narrative_words"]) or 500
+    if state.summary_task is not None and state.summary_task.done():
+        try:
+            state.summary = state.summary_task.result()
+            if state.summary:
+                state.summary_msg = {"role": "system", "content": f"Summary so far: {state.summary}"}
+        except Exception:
+            pass  # keep the previous summary
+        state.summary_task = None
+    # Dynamic context last so the shared prefix stays cacheable
+    if state.ctx_key != (max_words, grounding):
+        state.ctx_key = (max_words, grounding)
+        state.ctx_msg["content"] = (
+            f"Keep responses under {max_words} words. {grounding}" if grounding
+            else f"Keep responses under {max_words} words."
+        )
+    if state.summary_msg is not None:
+        messages = [SYSTEM_MSG, state.summary_msg, *history.messages, state.ctx_msg]
+    else:
+        messages = [SYSTEM_MSG, *history.messages, state.ctx_msg]
+
+    # Room for a reply at the word limit, plus a little per grounding fact,
+    # trimmed toward what replies have actually needed so far
+    predict_cap = min(int(max_words * 1.6), 384 + len(grounding) // 2)
+    predict_tokens = min(predict_cap, max(128, int(state.reply_ema * 1.5)))
+    narrated_event: Optional[int] = None
+    narrated_session: Optional[str] = None
+    if state.staged is not None:
+        # One call narrates the new tile and answers the player
+        narr_msgs, narr_opts = _narration_request(state.staged[0])
+        messages.insert(-2, {
             "role": "system",
             "content": (
-                f"{SYSTEM_PERSONA} Keep responses under {max_words} words. "
-                "Ground answers in provided tool facts when available. "
-                "Do not invent exits, items, entities, or hazards beyond provided facts."
+                f"{narr_msgs[0]['content']}\n{narr_msgs[1]['content']}"
+                "\nNarrate this scene first, then respond to the player."
             ),
-        }]
-        if grounding:
-            messages.append({"role":"system", "content": grounding})
-        messages.extend(history)
-
-        # Allow longer completions by raising token limit
-        predict_tokens = int((max_words if 'max_words' in locals() else 500) * 1.6)
-        response = client.chat(
-            model="dnd-writer-moe:latest",
+        })
+        predict_tokens = max(predict_tokens, narr_opts["num_predict"])
+        narrated_event = state.staged[1]
+        narrated_session = state.staged[0].get("session_id")
+        state.staged = None
+    try:
+        stream = await client.chat(
+            model=MODEL,
             messages=messages,
-            options={
-                "num_predict": max(256, min(2048, predict_tokens)),
-                "temperature": 0.8,
-            },
+            options=_gen_options(messages, max(128, min(2048, predict_tokens))),
+            stream=True,
+            keep_alive=KEEP_ALIVE,
         )
-        assistant_msg = response['message']['content']
-        print(f"DM: {assistant_msg}")
-        history.append({"role":"assistant","content":assistant_msg})
-        if hints_enabled and last_tile:
-            print("👉 Try:", " | ".join(_list_suggestions(last_tile)))
-        # Try to log narrative against the last move event if present (best-effort)
-        try:
-            # We cannot know event_id directly; this is a simple attempt to attach to last journal turn
-            # In a richer loop we'd track last move event id from the :move command
-            pass
-        except Exception:
-            pass
+        assistant_msg = await _stream_print(stream)
+    except Exception as e:
+        _forget_model_if_missing(e)
+        raise
+    history.push("assistant", assistant_msg)
+    if narrated_event is not None:
+        _queue_log(narrated_session, assistant_msg, narrated_event)
+    else:
+        # ~1.3 tokens per word; a reply that ran into the limit counts as the
+        # full cap, so a too-small budget grows back instead of sticking
+        n_out = len(assistant_msg.split()) * 1.3
+        if n_out >= 0.9 * predict_tokens:
+            n_out = predict_cap
+        state.reply_ema = 0.7 * state.reply_ema + 0.3 * n_out
+    state.unsummarized.extend(history.evict(MAX_TURNS, HISTORY_CHAR_BUDGET))
+    if state.unsummarized and state.summary_task is None:
+        state.summary_task = asyncio.create_task(_summarize(client, state.summary, state.unsummarized))
+        state.unsummarized = []
+    if state.hints_enabled and last_tile:
+        print("👉 Try:", _hint_str(last_tile))
+
+
+_HISTFILE = os.path.expanduser("~/.dnd_history")
+_DIRECTIONS = ("north", "south", "east", "west", "up", "down", "forward", "back", "left", "right")
+# Commands whose argument is a direction, for second-word completion
+_DIRECTION_CMDS = {":move", "move", "go"}
+
+
+def _complete(text: str, index: int) -> Optional[str]:
+    line = readline.get_line_buffer()
+    head, sep, _ = line.lstrip().partition(" ")
+    if sep and head.lower() in _DIRECTION_CMDS:
+        options = [d for d in _DIRECTIONS if d.startswith(text)]
+    else:
+        # Legacy "name(" forms still work but aren't offered
+        options = [c for c in (*COMMANDS, *_LOOK_ALIASES, "exit") if c.startswith(text) and "(" not in c]
+    return options[index] if index < len(options) else None
+
+
+def _setup_readline() -> None:
+    """Enable input history and tab completion of command names and directions."""
+    if readline is None or not sys.stdin.isatty():
+        return
+    try:
+        readline.read_history_file(_HISTFILE)
+    except (FileNotFoundError, OSError):
+        pass
+    readline.set_history_length(1000)
+    atexit.register(readline.write_history_file, _HISTFILE)
+    # Only whitespace splits words, so ":move" and "!roll-a" complete whole
+    readline.set_completer_delims(" \t\n")
+    readline.set_completer(_complete)
+    readline.parse_and_bind("tab: complete")
+
+
+class _PipeReader:
+    """Line reader for piped stdin that hands back every line already available.
+
+    Scripted playback (``cat moves.txt | python loop.py``) then arrives as a
+    run of commands, so consecutive moves can share one narration call. It
+    reads the fd directly: lines sitting in sys.stdin's buffer are invisible
+    to select().
+    """
+
+    def __init__(self, fd: int) -> None:
+        self.fd = fd
+        self.buf = b""
+        self.eof = False
+
+    def _fill(self) -> None:
+        chunk = os.read(self.fd, 65536)
+        if chunk:
+            self.buf += chunk
+        else:
+            self.eof = True
+
+    def read_lines(self) -> List[str]:
+        """Block for at least one line (or EOF), then take whatever else is ready."""
+        while b"\n" not in self.buf and not self.eof:
+            self._fill()
+        while not self.eof and select.select([self.fd], [], [], 0)[0]:
+            self._fill()
+        if self.eof:
+            data, self.buf = self.buf, b""
+        else:
+            cut = self.buf.rindex(b"\n") + 1
+            data, self.buf = self.buf[:cut], self.buf[cut:]
+        return data.decode("utf-8", "replace").splitlines()
+
+
+def _pipe_reader() -> Optional[_PipeReader]:
+    """A _PipeReader when stdin is a pipe or file on POSIX; None for a terminal."""
+    if os.name != "posix":
+        return None  # select() only handles sockets on Windows
+    try:
+        if sys.stdin.isatty():
+            return None
+        return _PipeReader(sys.stdin.fileno())
+    except (AttributeError, ValueError, OSError):
+        return None  # stdin replaced or closed
+
+
+def _move_queued(state: ReplState) -> bool:
+    """True when the next read-ahead line is another move."""
+    if not state.queued:
+        return False
+    resolved = _resolve(state.queued[0].strip())
+    return resolved is not None and resolved[0] in _MOVES
+
+
+def _batch_size_arg(args: List[str]) -> int:
+    """Value of --batch-narrate N (or --batch-narrate=N); 0 when absent."""
+    for i, a in enumerate(args):
+        if a.startswith("--batch-narrate"):
+            val = a.partition("=")[2] or (args[i + 1] if i + 1 < len(args) else "")
+            try:
+                return max(0, int(val))
+            except ValueError:
+                print("❌ --batch-narrate expects a number, e.g. --batch-narrate 3")
+                return 0
+    return 0
+
+
+async def main(argv: list[str] | None = None):
+    # CLI flag to start the TUI directly
+    args = (argv if argv is not None else sys.argv[1:])
+    if any(a in {"--tui", "-u"} for a in args):
+        await _launch_tui()
+        return
+    # Block-buffer stdout; output is flushed explicitly per streamed token and
+    # before each prompt, so multi-line command output costs one write.
+    try:
+        sys.stdout.reconfigure(line_buffering=False, write_through=False)
+    except (AttributeError, ValueError):
+        pass  # stdout replaced by something that isn't a TextIOWrapper
+    client = _ollama_client()
+    loop = asyncio.get_running_loop()
+
+    # Ensure model is ready
+    await _ensure_model(client)
+
+    print(
+        ">> Commands: :start, :end, :reset, :move <dir>, :look, :spawn [name] [kind], :npc <id>, :journal, :sessions, :use <id>, :tools, :help, :hints on|off, :suggest, :ui\n"
+        ">> Combat: :generate encounter | :attack \"weapon\" \"NdM\" [adv|dis] | :combat status | :combat end\n"
+        ">> Prefer colon commands. Legacy function calls like spawnNpc('Gruk','goblin') are supported but normalized.\n"
+        ">> Aliases: 'go <dir>', 'move <dir>', 'look' (same as :look).\n"
+        ">> Dice: '!roll XdY', '!roll-a dY'. Chat free-form for narrative. 'exit' to quit.\n"
+        ">> UI: ':ui' to launch the three-pane interface, or run: python -m ui.tui\n"
+        ">> Narration streams in the background; dice, hints, :npc and :sessions run without waiting for it.\n"
+        ">> Server tuning: OLLAMA_NUM_PARALLEL (concurrent requests per model), OLLAMA_MAX_LOADED_MODELS (models kept in memory)."
+    )
+    _print_tools()
+    _setup_readline()
+    _ensure_session()
+    print("⏳ Warming model in the background...")
+    warm_task = asyncio.create_task(_warm_up(client))
+    pipe = _pipe_reader()
+    # Hold tile narration until the next input and fold it into a following
+    # free-form turn, saving one model round-trip for "move, then ask" flows.
+    state = ReplState(
+        client=client,
+        merge_narration="--merge-narration" in args,
+        batch_size=_batch_size_arg(args),
+    )
+
+    while True:
+        # Tiles also collect while more moves are already queued on piped
+        # input, and go out as one call once the run of moves ends
+        if state.staged is not None and (state.batch_size or state.pending_tiles or _move_queued(state)):
+            state.pending_tiles.append(state.staged)
+            state.staged = None
+            if state.batch_size and len(state.pending_tiles) >= state.batch_size:
+                _flush_batch(state)
+        elif state.staged is not None and not state.merge_narration:
+            _start_narration(state)
+        if state.pending_tiles and not state.batch_size and not _move_queued(state):
+            _flush_batch(state)
+        if state.prefetched_look is None and state.last_tile:
+            # Fetch grounding for the next chat turn while the user types
+            _prefetch_look(state)
+        if not state.queued:
+            sys.stdout.flush()
+            if pipe is None:
+                try:
+                    state.queued.append(await loop.run_in_executor(None, input, "You: "))
+                except EOFError:
+                    state.queued.append("exit")
+            else:
+                state.queued.extend(await loop.run_in_executor(None, pipe.read_lines) or ["exit"])
+        text = state.queued.popleft().strip()
+        if pipe is not None:
+            # No terminal echo on a pipe, so show the line the turn answers
+            print(f"You: {text}")
+        if text.lower() in _QUIT:
+            warm_task.cancel()
+            _flush_batch(state)
+            await _await_pending(state)
+            await _settle_background(state)
+            break
+
+        resolved = _resolve(text)
+        if state.staged is not None and resolved is not None:
+            # Not a chat turn, so the held narration goes out on its own
+            _start_narration(state)
+
+        if resolved is not None:
+            handler, arg = resolved
+            if handler not in _NO_WAIT:
+                # The narration describes the state this command builds on
+                await _await_pending(state)
+            if handler in _BACKGROUND:
+                task = asyncio.create_task(_run_handler(handler, arg, state))
+                state.background.add(task)
+                task.add_done_callback(state.background.discard)
+                continue
+            await _settle_background(state)
+            if handler in _MUTATING:
+                _drop_prefetch(state)
+                _invalidate_tile_caches()
+            if handler in _SESSION_SWITCHES:
+                await _flush_logs()  # record narratives before their session goes away
+            await _run_handler(handler, arg, state)
+            continue
+
+        # A chat turn is the idle point: narrate what has queued up first
+        _flush_batch(state)
+        await _await_pending(state)
+        await _settle_background(state)
+        await _chat(text, state)
 
 if __name__=="__main__":
-    main()
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+"""Optional native build of the dice roller.
+
+    pip install cython
+    python setup.py build_ext --inplace
+
+Builds tools/_dnd_cy, a C dice roller that dnd_tools uses for every pool that
+fits a C int when present. Imports stay ``from tools.dnd_tools import
+roll_dice``; deleting the built extension falls back to the pure-Python code.
+"""
+
+import sys
+
+from setuptools import Extension, setup
+
+try:  # optional build dependency
+    from Cython.Build import cythonize
+except ImportError:  # pragma: no cover - optional dependency
+    cythonize = None
+
+ext_modules = []
+if cythonize is not None:
+    # No -march=native: the built module should run on any machine of the same arch
+    flags = [] if sys.platform == "win32" else ["-O3"]
+    ext_modules += cythonize(
+        [Extension("tools._dnd_cy", ["tools/_dnd_cy.pyx"], extra_compile_args=flags)]
+    )
+
+setup(
+    name="mistral-q5-demo",
+    py_modules=[],
+    ext_modules=ext_modules,
+)
@@ -0,0 +1,167 @@
+from collections import Counter
+
+import pytest
+
+from tools import dnd_tools
+from tools.dnd_tools import parse_dice_notation, roll_dice, roll_dice_batch, roll_with_advantage
+
+
+# Chi-square critical values at p = 0.001, by degrees of freedom (faces - 1)
+_CHI2_CRIT = {2: 13.82, 5: 20.52, 19: 43.82}
+
+
+def _chi2(counts, sides, n):
+    expected = n / sides
+    return sum((counts.get(face, 0) - expected) ** 2 / expected for face in range(1, sides + 1))
+
+
+@pytest.fixture(autouse=True)
+def _seeded():
+    dnd_tools._RAND.seed(1234)
+
+
+@pytest.mark.parametrize(
+    "notation, expected",
+    [
+        ("2d6", (2, 6)),
+        ("d20", (1, 20)),
+        ("D20", (1, 20)),
+        ("2D6", (2, 6)),
+        (" 3d8 ", (3, 8)),
+        ("1d100", (1, 100)),
+        ("007d4", (7, 4)),
+    ],
+)
+def test_parse_dice_notation_valid(notation, expected):
+    assert parse_dice_notation(notation) == expected
+
+
+@pytest.mark.parametrize(
+    "notation", ["", "abc", "20", "d", "2d", "0d6", "2d0", "-1d6", "1d6+2", "2dd6", "xd6", "2 d6"]
+)
+def test_parse_dice_notation_invalid(notation):
+    with pytest.raises(ValueError):
+        parse_dice_notation(notation)
+
+
+def test_parse_dice_notation_invalid_is_not_cached():
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            parse_dice_notation("0d6")
+
+
+@pytest.mark.parametrize("notation", ["d6", "1d20", "3d8", "20d20", "40d6", "2d1"])
+def test_roll_dice_bounds(notation):
+    count, sides = parse_dice_notation(notation)
+    for _ in range(200):
+        r = roll_dice(notation)
+        assert r["count"] == count and r["sides"] == sides
+        assert len(r["rolls"]) == count
+        assert all(1 <= v <= sides for v in r["rolls"])
+        assert r["total"] == sum(r["rolls"])
+
+
+@pytest.mark.parametrize("sides", [3, 6, 20])
+@pytest.mark.parametrize("count", [1, 4, 40])
+def test_roll_dice_uniform(count, sides):
+    counts = Counter()
+    for _ in range(60000 // count):
+        counts.update(roll_dice(f"{count}d{sides}")["rolls"])
+    assert _chi2(counts, sides, sum(counts.values())) < _CHI2_CRIT[sides - 1]
+
+
+def test_roll_many_python_path_uniform(monkeypatch):
+    monkeypatch.setattr(dnd_tools, "_roll_dice_c", None)
+    rolls, total = dnd_tools._roll_many(60000, 6)
+    assert total == sum(rolls)
+    assert _chi2(Counter(rolls), 6, len(rolls)) < _CHI2_CRIT[5]
+
+
+def test_roll_many_keeps_big_pools_off_the_c_roller(monkeypatch):
+    calls = []
+
+    def fake_c(count, sides, seed):
+        calls.append((count, sides))
+        return [1] * count, count
+
+    monkeypatch.setattr(dnd_tools, "_roll_dice_c", fake_c)
+    dnd_tools._roll_many(3, 6)
+    rolls, total = dnd_tools._roll_many(2, 2**40)
+    assert calls == [(3, 6)]
+    assert all(1 <= v <= 2**40 for v in rolls) and total == sum(rolls)
+
+
+def test_c_roller_matches_python_distribution():
+    c = pytest.importorskip("tools._dnd_cy")
+    for sides in (1, 6, 20, 2**31 - 1):
+        rolls, total = c.roll_dice_c(5000, sides, 99)
+        assert all(1 <= v <= sides for v in rolls) and total == sum(rolls)
+    assert c.roll_dice_c(10, 20, 7) == c.roll_dice_c(10, 20, 7)
+    for sides in (3, 6, 20):
+        rolls, _ = c.roll_dice_c(60000, sides, 12345)
+        assert _chi2(Counter(rolls), sides, len(rolls)) < _CHI2_CRIT[sides - 1]
+
+
+@pytest.mark.parametrize("sides", [6, 20])
+def test_roll_two_fast_path_is_exactly_uniform(monkeypatch, sides):
+    # Feed every 16-bit half through the one-word path; accepted halves must
+    # hit each face equally often, and rejected ones fall back to choices()
+    fallback = []
+    monkeypatch.setattr(dnd_tools, "_choices", lambda faces, k: fallback.append(k) or [1, 1])
+    counts = Counter()
+    for half in range(1 << 16):
+        monkeypatch.setattr(dnd_tools, "_getrandbits", lambda bits, w=(half << 16) | half: w)
+        before = len(fallback)
+        rolls, _ = dnd_tools._roll_two(sides, True)
+        if len(fallback) == before:
+            assert rolls[0] == rolls[1]
+            counts[rolls[0]] += 1
+    assert set(counts) == set(range(1, sides + 1))
+    assert len(set(counts.values())) == 1
+    assert len(fallback) == 65536 % sides
+
+
+@pytest.mark.parametrize("sides", [6, 20, 1000])
+def test_roll_two_bounds_and_kept_die(sides):
+    counts = Counter()
+    for _ in range(30000):
+        rolls, high = dnd_tools._roll_two(sides, True)
+        _, low = dnd_tools._roll_two(sides, False)
+        assert len(rolls) == 2 and all(1 <= v <= sides for v in rolls)
+        assert high == max(rolls) and 1 <= low <= sides
+        counts.update(rolls)
+    if sides <= 20:
+        assert _chi2(counts, sides, sum(counts.values())) < _CHI2_CRIT[sides - 1]
+
+
+def test_roll_with_advantage_keeps_higher():
+    for _ in range(500):
+        r = roll_with_advantage("d20")
+        assert r["result"] == max(r["rolls"])
+        assert r["is_critical_success"] == (r["result"] == 20)
+
+
+def test_roll_dice_batch_shapes_and_bounds():
+    np = pytest.importorskip("numpy")
+    b = roll_dice_batch("3d6", 5000)
+    assert b["rolls"].shape == (5000, 3)
+    assert b["rolls"].min() >= 1 and b["rolls"].max() <= 6
+    assert b["totals"].dtype == np.int64
+    assert (b["totals"] == b["rolls"].sum(axis=1)).all()
+    assert not b["criticals"].any()
+    assert _chi2(Counter(b["rolls"].ravel().tolist()), 6, b["rolls"].size) < _CHI2_CRIT[5]
+
+
+def test_roll_dice_batch_criticals():
+    pytest.importorskip("numpy")
+    b = roll_dice_batch("d20", 2000)
+    assert (b["criticals"] == (b["rolls"][:, 0] == 20)).all()
+
+
+def test_roll_dice_batch_totals_do_not_wrap():
+    pytest.importorskip("numpy")
+    b = roll_dice_batch("d%d" % (2**62), 50)
+    assert (b["totals"] > 0).all()
+    assert (b["totals"] == b["rolls"][:, 0]).all()
+    with pytest.raises(ValueError):
+        roll_dice_batch("3d%d" % (2**62), 1)
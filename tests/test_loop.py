@@ -0,0 +1,87 @@
+import pytest
+
+import loop
+from loop import ChatHistory, _resolve
+
+
+def _history(*contents):
+    h = ChatHistory()
+    for i, text in enumerate(contents):
+        h.push("user" if i % 2 == 0 else "assistant", text)
+    return h
+
+
+def _consistent(h):
+    assert len(h.roles) == len(h.contents) == len(h.messages) == len(h)
+    assert h.chars == sum(map(len, h.contents))
+    assert [m["content"] for m in h.messages] == h.contents
+    assert [m["role"] for m in h.messages] == h.roles
+
+
+def test_evict_under_both_caps_keeps_everything():
+    h = _history("a", "bb", "ccc")
+    assert h.evict(10, 100) == []
+    assert h.contents == ["a", "bb", "ccc"]
+    _consistent(h)
+
+
+def test_evict_drops_oldest_past_max_turns():
+    h = _history("1", "2", "3", "4", "5")
+    evicted = h.evict(3, 100)
+    assert [m["content"] for m in evicted] == ["1", "2"]
+    assert h.contents == ["3", "4", "5"]
+    assert h.roles == ["user", "assistant", "user"]
+    _consistent(h)
+
+
+def test_evict_drops_oldest_past_char_budget():
+    h = _history("x" * 10, "y" * 10, "z" * 10)
+    evicted = h.evict(10, 25)
+    assert [m["content"] for m in evicted] == ["x" * 10]
+    assert h.chars == 20
+    _consistent(h)
+
+
+def test_evict_keeps_newest_however_long():
+    h = _history("short", "x" * 500)
+    evicted = h.evict(10, 100)
+    assert [m["content"] for m in evicted] == ["short"]
+    assert h.contents == ["x" * 500]
+    assert h.evict(10, 100) == []
+    _consistent(h)
+
+
+def test_evict_then_push_stays_consistent():
+    h = ChatHistory()
+    for i in range(50):
+        h.push("user", "m" * (i % 7))
+        h.evict(8, 20)
+        _consistent(h)
+        assert len(h) <= 8
+
+
+@pytest.mark.parametrize(
+    "text, handler, arg",
+    [
+        (":move north", loop._cmd_move, "north"),
+        (":MOVE  north ", loop._cmd_move, "north"),
+        ("go east", loop._cmd_move, "east"),
+        ("Move west", loop._cmd_move, "west"),
+        (":look", loop._cmd_look, ""),
+        ("look", loop._cmd_look, ""),
+        ("Look Around", loop._cmd_look, ""),
+        (":start", loop._cmd_start, ""),
+        ("!roll 2d6", loop._cmd_roll, "2d6"),
+        ("!roll-a d20", loop._cmd_roll_a, "d20"),
+        ("startSession", loop._cmd_start, ""),
+        ("spawnNpc('Gruk','goblin')", loop._legacy_spawnnpc, "spawnNpc('Gruk','goblin')"),
+        ("moveDir('north')", loop._legacy_movedir, "moveDir('north')"),
+    ],
+)
+def test_resolve_commands(text, handler, arg):
+    assert _resolve(text) == (handler, arg)
+
+
+@pytest.mark.parametrize("text", ["hello there", "look at the goblin", "where am I?", "north", "unknown(1)"])
+def test_resolve_free_form_is_chat(text):
+    assert _resolve(text) is None
@@ -0,0 +1,36 @@
+from tools import llm_tools_server as server
+
+
+def test_tile_is_deterministic_per_session_and_coords():
+    a = server._generate_tile("s_test", 3, -2, 1)
+    b = server._generate_tile("s_test", 3, -2, 1)
+    assert a["seed"] == b["seed"] == server._seed_for_tile("s_test", 3, -2, 1)
+    assert a["tile"] == b["tile"]
+    assert a["salient_facts"] == b["salient_facts"]
+
+
+def test_tile_seed_depends_on_session_and_coords():
+    seeds = {server._seed_for_tile(sid, x, 0, 0) for sid in ("s_a", "s_b") for x in range(20)}
+    assert len(seeds) == 40
+
+
+def test_tiles_vary_across_a_session():
+    biomes = {server._generate_tile("s_test", x, y, 0)["tile"]["biome"] for x in range(8) for y in range(8)}
+    assert len(biomes) > 1
+
+
+def test_revisited_tile_matches_first_visit():
+    start = server.start_session()
+    sid = start["session_id"]
+    try:
+        exits = start["exits"]
+        there = server.move(exits[0], session_id=sid)
+        back = {"north": "south", "south": "north", "east": "west", "west": "east"}[exits[0]]
+        server.move(back, session_id=sid)
+        session = server._SESSIONS[sid]
+        session["tiles"].clear()  # force regeneration from the seed
+        again = server.move(exits[0], session_id=sid)
+        assert again["tile"] == there["tile"]
+        assert again["salient_facts"] == there["salient_facts"]
+    finally:
+        server.end_session(sid)
@@ -0,0 +1,74 @@
+import textwrap
+
+import pytest
+
+from ui.commands import CommandRouter, CommandSpec
+
+
+@pytest.fixture
+def router():
+    calls = []
+    r = CommandRouter()
+    for name in ("move", "look", "roll"):
+        r.register(CommandSpec(name, name, lambda arg, name=name: calls.append((name, arg))))
+    r.calls = calls
+    return r
+
+
+@pytest.mark.parametrize(
+    "text, call",
+    [
+        (":move north", ("move", "north")),
+        ("go east", ("move", "east")),
+        ("GO east", ("move", "east")),
+        ("move west", ("move", "west")),
+        (":look", ("look", "")),
+        ("  :look  ", ("look", "")),
+        ("!roll", ("roll", "")),
+    ],
+)
+def test_dispatch_routes_commands(router, text, call):
+    assert router.dispatch(text) is True
+    assert router.calls == [call]
+
+
+@pytest.mark.parametrize("text", ["", "   ", "hello", "going home", "moveon", "!roll 2d6", "!roll-a d20"])
+def test_dispatch_leaves_chat_and_dice(router, text):
+    assert router.dispatch(text) is False
+    assert router.calls == []
+
+
+def test_dispatch_unknown_command_raises(router):
+    with pytest.raises(ValueError, match="Unknown command"):
+        router.dispatch(":dance")
+
+
+def _wrapper(width):
+    # Same settings as GameTUI._write_text
+    return textwrap.TextWrapper(
+        width=width,
+        replace_whitespace=False,
+        drop_whitespace=False,
+        break_on_hyphens=False,
+        break_long_words=True,
+    )
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "",
+        "short",
+        "   leading spaces",
+        "the quick brown fox jumps over the lazy dog " * 4,
+        "x" * 95,
+        "url: https://example.com/" + "a" * 70 + " and then some words",
+        "ab " + "y" * 23 + "z more words " + "Q" * 41,
+    ],
+)
+@pytest.mark.parametrize("width", [10, 20, 80])
+def test_wrap_line_round_trips(line, width):
+    tui = pytest.importorskip("ui.tui")
+    out = tui._wrap_line(_wrapper(width), line, width)
+    assert "".join(out) == line
+    assert all(len(piece) <= width for piece in out)
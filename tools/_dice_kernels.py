@@ -0,0 +1,60 @@
+"""Optional numba kernels for large dice pools.
+
+Kept apart from dnd_tools so importing it never touches numba; numba needs
+the interpreted bytecode of the functions it jits.
+
+numba is imported and the kernel compiled on the first large roll, so
+ordinary startup never pays for it. Set DND_NUMBA_WARM=1 to do that at import
+instead, e.g. for a simulation harness that wants steady timings from the
+first roll.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Callable, Optional
+
+np: Any = None  # bound by get_roll_batch once numba is known to be available
+
+_roll_batch: Optional[Callable[..., Any]] = None
+_loaded = False
+
+
+def _roll_batch_py(count, sides, seed):
+    # Plain Python source for numba; np is the module global bound at load time
+    np.random.seed(seed)
+    out = np.empty(count, np.int64)
+    total = 0
+    for i in range(count):
+        v = np.random.randint(1, sides + 1)
+        out[i] = v
+        total += v
+    return out, total
+
+
+def get_roll_batch() -> Optional[Callable[..., Any]]:
+    """The jitted ``roll_batch(count, sides, seed) -> (array, total)``, or None.
+
+    Compiled on the first call; None when numba/numpy are missing or broken.
+    """
+    global np, _roll_batch, _loaded
+    if _loaded:
+        return _roll_batch
+    _loaded = True
+    try:  # optional: compiled kernel for large dice pools
+        import numpy
+        from numba import njit
+    except Exception:  # pragma: no cover - optional dependency
+        return None
+    np = numpy
+    try:
+        kernel = njit(cache=True)(_roll_batch_py)
+        kernel(1, 6, 0)  # compile now so the roll that asked doesn't fail midway
+    except Exception:  # pragma: no cover - broken numba install
+        return None
+    _roll_batch = kernel
+    return kernel
+
+
+if os.environ.get("DND_NUMBA_WARM") == "1":
+    get_roll_batch()
@@ -0,0 +1,62 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""Optional C dice roller; build with ``python setup.py build_ext --inplace``.
+
+xoshiro256** seeded through splitmix64, so a roll is reproducible from its
+seed (dnd_tools passes one drawn from its own Random). Each die scales the top
+32 bits of one output with Lemire's multiply-shift and rejects the few
+outputs that would over-weight a face, so every face is exactly as likely.
+dnd_tools only calls this for sides and counts that fit a C int.
+"""
+
+from libc.stdint cimport uint32_t, uint64_t
+
+
+cdef inline uint64_t _rotl(uint64_t x, int k) nogil:
+    return (x << k) | (x >> (64 - k))
+
+
+cdef inline uint64_t _splitmix64(uint64_t* state) nogil:
+    state[0] += 0x9E3779B97F4A7C15ULL
+    cdef uint64_t z = state[0]
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL
+    return z ^ (z >> 31)
+
+
+cdef inline uint64_t _next(uint64_t* s) nogil:
+    cdef uint64_t out = _rotl(s[1] * 5, 7) * 9
+    cdef uint64_t t = s[1] << 17
+    s[2] ^= s[0]
+    s[3] ^= s[1]
+    s[1] ^= s[2]
+    s[0] ^= s[3]
+    s[2] ^= t
+    s[3] = _rotl(s[3], 45)
+    return out
+
+
+def roll_dice_c(int count, int sides, uint64_t seed):
+    """Roll count dice of the given sides; return (rolls, total)."""
+    if count < 0 or sides <= 0:
+        raise ValueError("Count and sides must be positive")
+    cdef uint64_t sm = seed
+    cdef uint64_t s[4]
+    s[0] = _splitmix64(&sm)
+    s[1] = _splitmix64(&sm)
+    s[2] = _splitmix64(&sm)
+    s[3] = _splitmix64(&sm)
+    cdef uint32_t n = <uint32_t>sides
+    cdef uint32_t threshold = (<uint32_t>0 - n) % n  # 2**32 mod n
+    cdef uint64_t m
+    cdef uint64_t total = 0
+    cdef uint32_t v
+    cdef int i
+    rolls = [0] * count
+    for i in range(count):
+        m = (_next(s) >> 32) * <uint64_t>n
+        while <uint32_t>m < threshold:
+            m = (_next(s) >> 32) * <uint64_t>n
+        v = <uint32_t>(m >> 32) + 1
+        rolls[i] = v
+        total += v
+    return rolls, total
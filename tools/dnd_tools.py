@@ -1,7 +1,21 @@
 from __future__ import annotations
 
-from typing import TypedDict
+from functools import lru_cache
+from typing import Any, NamedTuple, Optional, Sequence, TypedDict
 import random
+import re
+
+from ._dice_kernels import get_roll_batch
+
+try:  # optional: Cython roller built by setup.py
+    from ._dnd_cy import roll_dice_c as _roll_dice_c  # type: ignore
+except ImportError:  # pragma: no cover - optional extension
+    _roll_dice_c = None
+
+try:  # optional: vectorized rolls for large dice pools
+    import numpy as np
+except Exception:  # pragma: no cover - optional dependency
+    np = None  # type: ignore[assignment]
 
 
 class RollResult(TypedDict):
@@ -22,12 +36,27 @@ class RollResult(TypedDict):
     total: int
 
 
+# Well-formed NdM / dM (case and surrounding whitespace tolerated); anything
+# else takes the slow path for a precise error
+_DICE_RE = re.compile(r"\s*([0-9]*)[dD]([0-9]+)\s*\Z")
+
+
+@lru_cache(maxsize=256)
 def parse_dice_notation(notation: str) -> tuple[int, int]:
     """Parse dice notation and return (count, sides).
 
     Accepts standard NdM (e.g., "2d20") and the common shorthand "d20" which
     defaults to a single die (1d20). Raises ValueError for invalid input.
+    Results are cached, since play repeats a handful of notations; invalid
+    input is not cached and raises every time.
     """
+    m = _DICE_RE.match(notation)
+    if m:
+        count = int(m[1]) if m[1] else 1  # allow 'd20' shorthand
+        sides = int(m[2])
+        if count <= 0 or sides <= 0:
+            raise ValueError("Count and sides must be positive")
+        return count, sides
     s = notation.lower().strip()
     if "d" not in s:
         raise ValueError("Use NdM format (e.g., '2d20') or shorthand 'd20'")
@@ -46,17 +75,109 @@ def parse_dice_notation(notation: str) -> tuple[int, int]:
     return count, sides
 
 
+# The module's own Mersenne Twister, with its methods bound once so a roll
+# skips the attribute lookups on ``random``. Seed it with _RAND.seed(...).
+# Dice are game logic, not security: this stays a fast PRNG even if other
+# code swaps the ``random`` module's shared instance for SystemRandom, which
+# would read the OS entropy source on every die.
+_RAND = random.Random()
+_random = _RAND.random
+_choices = _RAND.choices
+_getrandbits = _RAND.getrandbits
+
+# One numpy generator for the module: building a Generator per roll cost more
+# than drawing a mid-sized pool. Seeded from _RAND at import time.
+_RNG = np.random.default_rng(_getrandbits(64)) if np is not None else None
+
+# Below these many dice the compiled / vectorized call costs more than it saves
+_NUMPY_MIN_DICE = 16
+_KERNEL_MIN_DICE = 32
+# roll_dice_c takes C ints; larger counts or dice stay on the Python paths
+_C_INT_MAX = 2**31 - 1
+
+
+@lru_cache(maxsize=64)
+def _faces(sides: int) -> range:
+    return range(1, sides + 1)
+
+
+def _roll_many(count: int, sides: int) -> tuple[list[int], int]:
+    """Roll count dice of the given sides; return (rolls, total).
+
+    Small pools use one ``choices`` call. Larger pools go through the numba
+    kernel (compiled on first use, seeded per call from _RAND) or the module's
+    numpy generator when available. Only the _RAND-backed paths follow a later
+    ``_RAND.seed``; _RNG is seeded once at import.
+
+    The total comes from wherever the dice were made: the kernel's running
+    sum, numpy's sum over the array, or ``sum()`` over the list, which is a
+    C loop and beats accumulating in Python.
+
+    When the Cython extension is built it handles every pool whose count and
+    sides fit a C int: its per-call cost is below even a two-die ``choices``
+    call.
+    """
+    if _roll_dice_c is not None and count <= _C_INT_MAX and sides <= _C_INT_MAX:
+        return _roll_dice_c(count, sides, _getrandbits(64))
+    if _RNG is not None and count >= _NUMPY_MIN_DICE:
+        kernel = get_roll_batch() if count >= _KERNEL_MIN_DICE else None
+        if kernel is not None:
+            arr, total = kernel(count, sides, _getrandbits(32))
+            return arr.tolist(), int(total)
+        arr = _RNG.integers(1, sides + 1, count, dtype=np.int64)
+        return arr.tolist(), int(arr.sum())
+    rolls = _choices(_faces(sides), k=count)
+    return rolls, sum(rolls)
+
+
+# Single standard dice cover most rolls in play; their exact notations map
+# straight to the side count, skipping the parse
+_FAST_SIDES = {
+    f"{count}{d}{sides}": sides
+    for sides in (4, 6, 8, 10, 12, 20, 100)
+    for count in ("", "1")
+    for d in ("d", "D")
+}
+_FAST_NOTATION = {sides: f"1d{sides}" for sides in _FAST_SIDES.values()}
+
+
+# Play repeats a handful of dice, so their normalised notation strings are
+# formatted once and then shared
+@lru_cache(maxsize=64)
+def _notation(count: int, sides: int) -> str:
+    return f"{count}d{sides}"
+
+
+@lru_cache(maxsize=64)
+def _die_notation(sides: int) -> str:
+    return f"d{sides}"
+
+
+class _Roll(NamedTuple):
+    """A roll without the per-call dict, for callers inside this module."""
+
+    notation: str
+    count: int
+    sides: int
+    rolls: list[int]
+    total: int
+
+
+def _roll(notation: str) -> _Roll:
+    sides = _FAST_SIDES.get(notation, 0)
+    if sides:
+        r = int(_random() * sides) + 1  # what choices() does for one die
+        return _Roll(_FAST_NOTATION[sides], 1, sides, [r], r)
+    count, sides = parse_dice_notation(notation)
+    rolls, total = _roll_many(count, sides)
+    return _Roll(_notation(count, sides), count, sides, rolls, total)
+
+
 def roll_dice(notation: str) -> RollResult:
     """Roll dice according to NdM or shorthand 'dM' and return a structured result."""
-    count, sides = parse_dice_notation(notation)
-    rolls = [random.randint(1, sides) for _ in range(count)]
-    return {
-        "notation": f"{count}d{sides}",
-        "count": count,
-        "sides": sides,
-        "rolls": rolls,
-        "total": sum(rolls),
-    }
+    r = _roll(notation)
+    return {"notation": r.notation, "count": r.count, "sides": r.sides, "rolls": r.rolls, "total": r.total}
+
 
 class AdvantageRollResult(TypedDict):
     """Structured result for a single-die roll with advantage.
@@ -80,43 +201,66 @@ class AdvantageRollResult(TypedDict):
     message: str
 
 
-def roll_with_advantage(notation: str) -> AdvantageRollResult:
-    """Roll a single die with advantage using dM notation (e.g., 'd20').
+# Only a natural 20 or 1 on a d20 is critical; one lookup yields
+# (is_critical_success, is_critical_fail, message)
+_CRIT = {
+    (20, 20): (True, False, "Critical success"),
+    (20, 1): (False, True, "Critical fail"),
+}
+_NO_CRIT = (False, False, "")
 
-    Rolls twice and takes the higher result. For a d20, prints critical messages
-    when the final result is a natural 20 or 1.
+
+# Largest die split out of one 32-bit word below. Above it, Lemire's
+# rejection would throw away too many 16-bit halves to pay off.
+_TWO_FROM_ONE_MAX_SIDES = 256
+
+
+def _roll_two(sides: int, higher: bool) -> tuple[list[int], int]:
+    """Roll two dice and return (rolls, kept die).
+
+    Common dice take both values from one ``getrandbits(32)`` word, each half
+    scaled to the die with Lemire's multiply-shift. A half whose low 16 bits
+    fall under ``65536 % sides`` would over-weight some faces, so the pair is
+    then redrawn with one ``choices`` call (at most 1 in 256 words for a d20).
+    Both paths are exactly uniform. Bigger dice always use ``choices``.
     """
-    s = notation.lower().strip()
-    if not s or "d" not in s:
-        raise ValueError("Use dM format, e.g., 'd20'")
-
-    # Accept 'd20' and also be forgiving and accept '1d20'
-    if s.startswith("d"):
-        sides_str = s[1:]
-        if not sides_str.isdigit():
-            raise ValueError("Use dM format with digits after 'd', e.g., 'd20'")
-        sides = int(sides_str)
+    if sides <= _TWO_FROM_ONE_MAX_SIDES:
+        r = _getrandbits(32)
+        hi = (r >> 16) * sides
+        lo = (r & 0xFFFF) * sides
+        threshold = 65536 % sides  # 0 for power-of-two dice: never rejects
+        if (hi & 0xFFFF) >= threshold and (lo & 0xFFFF) >= threshold:
+            first = (hi >> 16) + 1
+            second = (lo >> 16) + 1
+            rolls = [first, second]
+        else:
+            rolls = _choices(_faces(sides), k=2)
+            first, second = rolls
     else:
-        # fallback to NdM parsing; enforce single die for advantage
-        count, sides = parse_dice_notation(s)
-        if count != 1:
-            raise ValueError("Advantage uses a single die: use 'd20', not '2d20'")
+        rolls = _choices(_faces(sides), k=2)
+        first, second = rolls
+    if higher:
+        return rolls, first if first >= second else second
+    return rolls, first if first <= second else second
 
-    if sides <= 0:
-        raise ValueError("Sides must be positive")
 
-    first = random.randint(1, sides)
-    second = random.randint(1, sides)
-    result = max(first, second)
+def _parse_single_die(notation: str, label: str) -> int:
+    """Sides of a dM / 1dM notation, via the same cached parse as roll_dice."""
+    count, sides = parse_dice_notation(notation)
+    if count != 1:
+        raise ValueError(f"{label} uses a single die: use 'd20', not '2d20'")
+    return sides
 
-    is_crit_success = sides == 20 and result == 20
-    is_crit_fail = sides == 20 and result == 1
-    message = "Critical success" if is_crit_success else ("Critical fail" if is_crit_fail else "")
 
+def _roll_edge(notation: str, higher: bool, label: str) -> AdvantageRollResult:
+    """Shared body of advantage (higher=True) and disadvantage rolls."""
+    sides = _parse_single_die(notation, label)
+    rolls, result = _roll_two(sides, higher)
+    is_crit_success, is_crit_fail, message = _CRIT.get((sides, result), _NO_CRIT)
     return {
-        "notation": f"d{sides}",
+        "notation": _die_notation(sides),
         "sides": sides,
-        "rolls": [first, second],
+        "rolls": rolls,
         "result": result,
         "is_critical_success": is_crit_success,
         "is_critical_fail": is_crit_fail,
@@ -124,6 +268,15 @@ def roll_with_advantage(notation: str) -> AdvantageRollResult:
     }
 
 
+def roll_with_advantage(notation: str) -> AdvantageRollResult:
+    """Roll a single die with advantage using dM notation (e.g., 'd20').
+
+    Rolls twice and takes the higher result. For a d20, prints critical messages
+    when the final result is a natural 20 or 1.
+    """
+    return _roll_edge(notation, True, "Advantage")
+
+
 class DisadvantageRollResult(TypedDict):
     """Structured result for a single-die roll with disadvantage using dM notation.
 
@@ -141,40 +294,7 @@ class DisadvantageRollResult(TypedDict):
 
 def roll_with_disadvantage(notation: str) -> DisadvantageRollResult:
     """Roll a single die with disadvantage using dM notation (e.g., 'd20')."""
-    s = notation.lower().strip()
-    if not s or "d" not in s:
-        raise ValueError("Use dM format, e.g., 'd20'")
-
-    if s.startswith("d"):
-        sides_str = s[1:]
-        if not sides_str.isdigit():
-            raise ValueError("Use dM format with digits after 'd', e.g., 'd20'")
-        sides = int(sides_str)
-    else:
-        count, sides = parse_dice_notation(s)
-        if count != 1:
-            raise ValueError("Disadvantage uses a single die: use 'd20', not '2d20'")
-
-    if sides <= 0:
-        raise ValueError("Sides must be positive")
-
-    first = random.randint(1, sides)
-    second = random.randint(1, sides)
-    result = min(first, second)
-
-    is_crit_success = sides == 20 and result == 20
-    is_crit_fail = sides == 20 and result == 1
-    message = "Critical success" if is_crit_success else ("Critical fail" if is_crit_fail else "")
-
-    return {
-        "notation": f"d{sides}",
-        "sides": sides,
-        "rolls": [first, second],
-        "result": result,
-        "is_critical_success": is_crit_success,
-        "is_critical_fail": is_crit_fail,
-        "message": message,
-    }
+    return _roll_edge(notation, False, "Disadvantage")
 
 
 class DamageRollResult(TypedDict):
@@ -195,16 +315,69 @@ class DamageRollResult(TypedDict):
 
 def roll_damage(notation: str, crit_multiplier: int = 1) -> DamageRollResult:
     """Roll damage using NdM notation. Caller decides crit multiplier (1=normal, 2=crit)."""
-    base = roll_dice(notation)
-    total = int(base["total"]) * int(max(1, crit_multiplier))
+    base = _roll(notation)
+    cm = crit_multiplier if crit_multiplier >= 1 else 1
+    if type(cm) is not int:
+        cm = int(cm)  # e.g. 2.0 or a bool from a caller
     return {
-        "notation": base["notation"],
-        "rolls": base["rolls"],
-        "total": total,
-        "crit_multiplier": int(max(1, crit_multiplier)),
+        "notation": base.notation,
+        "rolls": base.rolls,
+        "total": base.total * cm,
+        "crit_multiplier": cm,
     }
 
 
+def roll_damage_many(notation: str, n_attacks: int, crit_mask: Optional[Sequence[bool]] = None) -> list[int]:
+    """Roll the same damage notation for n_attacks attacks; return each total.
+
+    Meant for simulations that evaluate many attacks at once: the notation is
+    parsed once and all ``count * n_attacks`` dice come from one numpy call
+    (or one ``choices`` call without numpy). Totals where crit_mask is true
+    are doubled, as roll_damage(..., crit_multiplier=2) would.
+    """
+    count, sides = parse_dice_notation(notation)
+    if n_attacks <= 0:
+        return []
+    if crit_mask is not None and len(crit_mask) != n_attacks:
+        raise ValueError("crit_mask must have one entry per attack")
+    if _RNG is not None:
+        totals = _RNG.integers(1, sides + 1, size=(n_attacks, count), dtype=np.int64).sum(axis=1)
+        if crit_mask is not None:
+            totals *= np.where(np.asarray(crit_mask, dtype=bool), 2, 1)
+        return totals.tolist()
+    flat = _choices(_faces(sides), k=count * n_attacks)
+    totals_py = [sum(flat[i:i + count]) for i in range(0, count * n_attacks, count)]
+    if crit_mask is not None:
+        totals_py = [t * 2 if crit else t for t, crit in zip(totals_py, crit_mask)]
+    return totals_py
+
+
+def roll_dice_batch(notation: str, n: int) -> dict[str, Any]:
+    """Roll the same notation n times; return numpy columns instead of n dicts.
+
+    Keys (structure-of-arrays, one row per roll):
+    - rolls: (n, count) array of die results, int16 for dice up to d32767
+    - totals: (n,) int64 array of row sums
+    - criticals: (n,) bool array, true for a natural 20 on a single d20
+
+    For simulations: statistics such as mean damage or crit rate become one
+    vector operation. Requires numpy. Raises ValueError for notations whose
+    largest total does not fit in int64.
+    """
+    if _RNG is None:
+        raise RuntimeError("roll_dice_batch requires numpy")
+    count, sides = parse_dice_notation(notation)
+    if count * sides > np.iinfo(np.int64).max:
+        raise ValueError(f"{notation!r} can total more than an int64 holds")
+    dtype = np.int16 if sides <= np.iinfo(np.int16).max else np.int64
+    rolls = _RNG.integers(1, sides + 1, size=(max(0, n), count), dtype=dtype)
+    if count == 1 and sides == 20:
+        criticals = rolls[:, 0] == 20
+    else:
+        criticals = np.zeros(rolls.shape[0], dtype=bool)
+    return {"rolls": rolls, "totals": rolls.sum(axis=1, dtype=np.int64), "criticals": criticals}
+
+
 __all__ = [
     "RollResult",
     "AdvantageRollResult",
@@ -215,4 +388,6 @@ __all__ = [
     "roll_with_advantage",
     "roll_with_disadvantage",
     "roll_damage",
+    "roll_damage_many",
+    "roll_dice_batch",
 ]
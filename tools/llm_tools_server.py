@@ -4,19 +4,23 @@ MCP stdio server for Cursor — exposes typed tools the model can call in chat/f
 Run with: python -m tools.llm_tools_server
 """
 
+from collections import OrderedDict, deque
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Dict, Any, Tuple
+from typing import Callable, List, Optional, Dict, Any, Tuple
 import logging
 import os
 import platform
+import re
 import sys
 import threading
 import hashlib
+import itertools
+import struct
 import uuid
 import time
 import random
 
-from mcp.server.fastmcp import FastMCP
 from .dnd_tools import (
     roll_dice,
     roll_with_advantage,
@@ -24,7 +28,27 @@ from .dnd_tools import (
     roll_damage,
 )
 
-mcp = FastMCP("llm-tools")  # server name as it will appear in Cursor
+# Tool functions in definition order. They are plain functions until the
+# stdio server is built, so importing this module (as loop.py and the TUI do)
+# doesn't pull in the mcp stack.
+_MCP_TOOLS: List[Callable[..., Any]] = []
+
+
+def _tool(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Mark fn for registration by _get_server(); returns it unchanged."""
+    _MCP_TOOLS.append(fn)
+    return fn
+
+
+@lru_cache(maxsize=1)
+def _get_server():
+    """Build the FastMCP server and register every _tool function on it."""
+    from mcp.server.fastmcp import FastMCP
+
+    server = FastMCP("llm-tools")  # server name as it will appear in Cursor
+    for fn in _MCP_TOOLS:
+        server.tool()(fn)
+    return server
 
 
 def _configure_logging() -> logging.Logger:
@@ -92,23 +116,31 @@ _TOOL_ALIASES = [
     "combatStatus",
     "combatEnd",
 ]
+# Tool list reported by health(), built once
+_ALL_TOOL_NAMES = tuple(_TOOL_NAMES + _TOOL_ALIASES + ["tools_help"])
 
 # ============================
 # In-memory world state (authoritative)
 # ============================
 
-# Session store keyed by session_id
-_SESSIONS: Dict[str, Dict[str, Any]] = {}
+# Session store keyed by session_id, oldest first; new sessions evict the
+# oldest inactive one past the cap, unplayed sessions before played ones
+_SESSIONS: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_MAX_SESSIONS = 64
 _ACTIVE_SESSION_ID: Optional[str] = None
 
 # Per-session locks to serialize state changes
 _SESSION_LOCKS: Dict[str, threading.Lock] = {}
 
-# Monotonic event id per server instance
-_NEXT_EVENT_ID: int = 1
+# Guards adding and removing entries of _SESSIONS and _SESSION_LOCKS. Taken
+# after a session lock, never before one, except by a non-blocking acquire.
+_REGISTRY_LOCK = threading.Lock()
+
+# Monotonic event id per server instance; count.__next__ is atomic under the GIL
+_next_event_id: Callable[[], int] = itertools.count(1).__next__
 
 # Directions and movement deltas
-_BASE_DIRECTIONS = {"north", "south", "east", "west", "up", "down"}
+_BASE_DIRECTIONS = frozenset({"north", "south", "east", "west", "up", "down"})
 _DELTAS: Dict[str, Tuple[int, int, int]] = {
     "north": (0, 1, 0),
     "south": (0, -1, 0),
@@ -129,176 +161,351 @@ _DIR_ALIASES: Dict[str, str] = {
 
 _TURN_JOURNAL_ROLLUP_INTERVAL = 8  # summarize periodically
 _JOURNAL_MAX_ENTRIES = 32
+_EVENTS_MAX = 5000
+# Generated tiles kept per session. Tiles are seeded, so an evicted one
+# regenerates identically; tiles changed after generation (spawned NPCs) are
+# pinned instead and never evicted.
+_MAX_CACHED_TILES = 4096
+
+
+# (epoch second, its ISO string); one tuple so threads never see a torn pair
+_ISO_CACHE: Tuple[int, str] = (0, "")
 
 
 def _now_iso() -> str:
-    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    # Events within the same second share one formatted string
+    global _ISO_CACHE
+    t = int(time.time())
+    cached = _ISO_CACHE
+    if cached[0] != t:
+        cached = _ISO_CACHE = (t, time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(t)))
+    return cached[1]
 
 
 def _coord_key(x: int, y: int, z: int) -> str:
+    # Display form only; tile dicts are keyed by (x, y, z) tuples
     return f"{x},{y},{z}"
 
 
+_COMPASS = ("north", "east", "south", "west")
+_COMPASS_INDEX = {d: i for i, d in enumerate(_COMPASS)}
+# Relative words -> quarter turns clockwise from the current heading
+_RELATIVE_TURNS = {
+    "forward": 0, "ahead": 0,
+    "back": 2, "backward": 2, "reverse": 2,
+    "left": 3,
+    "right": 1,
+}
+
+
+def _build_norm_table() -> Dict[Tuple[str, str], Tuple[str, str]]:
+    table: Dict[Tuple[str, str], Tuple[str, str]] = {}
+    for heading, i in _COMPASS_INDEX.items():
+        for word in list(_BASE_DIRECTIONS) + list(_DIR_ALIASES):
+            d = _DIR_ALIASES.get(word, word)
+            # face the way you moved; up/down keep the heading
+            table[(word, heading)] = (d, d if d in _COMPASS else heading)
+        for word, turns in _RELATIVE_TURNS.items():
+            d = _COMPASS[(i + turns) % 4]
+            table[(word, heading)] = (d, d)
+    return table
+
+
+# (direction word, heading) -> (absolute_direction, new_heading)
+_NORM_TABLE = _build_norm_table()
+
+
 def _normalize_direction(direction: str, heading: str) -> Tuple[str, str]:
     """Normalize direction aliases and relative forms.
 
     Returns a tuple of (absolute_direction, new_heading).
     Relative forms: forward/back/left/right adjust using heading.
     """
-    s = direction.strip().lower()
-    # direct aliases
-    if s in _DIR_ALIASES:
-        s = _DIR_ALIASES[s]
-
-    if s in _BASE_DIRECTIONS:
-        # heading unchanged for cardinal/up/down moves
-        if s in {"north", "south", "east", "west"}:
-            return s, s  # face the way you moved
-        return s, heading
-
-    # relative forms
-    compass = ["north", "east", "south", "west"]
-    try:
-        idx = compass.index(heading) if heading in compass else 0
-    except ValueError:
-        idx = 0
-    if s in {"forward", "ahead"}:
-        return compass[idx], compass[idx]
-    if s in {"back", "backward", "reverse"}:
-        return compass[(idx + 2) % 4], compass[(idx + 2) % 4]
-    if s in {"left"}:
-        return compass[(idx - 1) % 4], compass[(idx - 1) % 4]
-    if s in {"right"}:
-        return compass[(idx + 1) % 4], compass[(idx + 1) % 4]
-
-    raise ValueError(
-        "Unknown direction. Use north/south/east/west/up/down or forward/back/left/right."
-    )
+    if heading not in _COMPASS_INDEX:
+        heading = "north"
+    r = _NORM_TABLE.get((direction.strip().lower(), heading))
+    if r is None:
+        raise ValueError(
+            "Unknown direction. Use north/south/east/west/up/down or forward/back/left/right."
+        )
+    return r
+
+
+@lru_cache(maxsize=256)
+def _seed_key(session_id: str) -> bytes:
+    """Per-session blake2b key, derived once per session id."""
+    return hashlib.sha256(session_id.encode("utf-8")).digest()[:16]
+
+
+_COORDS = struct.Struct("<qqq")
+
+
+def _tile_digest(session_id: str, x: int, y: int, z: int) -> bytes:
+    # Keyed blake2b over the packed coordinates: no string formatting,
+    # encoding or hex round-trip per tile
+    return hashlib.blake2b(_COORDS.pack(x, y, z), key=_seed_key(session_id), digest_size=32).digest()
 
 
 def _seed_for_tile(session_id: str, x: int, y: int, z: int) -> int:
-    h = hashlib.sha256(f"{session_id}:{x},{y},{z}".encode("utf-8")).hexdigest()
-    return int(h[:16], 16)
+    return int.from_bytes(_tile_digest(session_id, x, y, z)[:8], "little")
+
+
+_BIOMES = ("ruined_keep", "crypt", "cavern", "armory", "library", "underground_river")
+_LIGHTING = ("dark", "dim", "torchlit", "glimmering")
+_TILE_ENTITY_KINDS = ("goblin", "skeleton", "bat", "kobold", "slime")
+_DISPOSITIONS = ("hostile", "wary", "indifferent")
+_ITEM_KINDS = ("scroll", "rusty_blade", "torch", "amulet", "potion")
+_EXIT_ORDER = ("north", "east", "south", "west")
+_HAZARDS = ("loose_stones", "slick_moss", "unstable_beam")
+_NPC_KINDS = ("goblin", "skeleton", "kobold", "bandit", "slime")  # spawn_npc
+# Exit tuple for each 4-bit exits mask, bit i = _EXIT_ORDER[i]
+_EXITS_BY_MASK = tuple(
+    tuple(e for i, e in enumerate(_EXIT_ORDER) if m >> i & 1) for m in range(16)
+)
+# The 32-byte tile digest read as sixteen 16-bit draws
+_DRAWS = struct.Struct("<16H")
+
+
+def _pick(n: int, draw: int) -> int:
+    """Index into a table of n entries from a 16-bit draw."""
+    return (draw * n) >> 16
+
+
+def _tile_indices(d: Tuple[int, ...]) -> Tuple[int, int, int, int, int, int, int, int, int]:
+    """Tile contents as small ints from the sixteen digest draws.
+
+    Returns (biome, lighting, entity_kind, disposition, entity_num, item_kind,
+    item_num, exits_mask, hazard); kind/hazard are -1 when absent and bit i of
+    exits_mask is _EXIT_ORDER[i]. Thresholds are out of 65536.
+    """
+    entity = _pick(len(_TILE_ENTITY_KINDS), d[3]) if d[2] < 32768 else -1  # 50%
+    item = _pick(len(_ITEM_KINDS), d[7]) if d[6] < 32768 else -1  # 50%
+    mask = (  # 70% each
+        (d[9] < 45875) | (d[10] < 45875) << 1 | (d[11] < 45875) << 2 | (d[12] < 45875) << 3
+    )
+    if not mask:
+        mask = 1 << _pick(4, d[13])
+    hazard = _pick(len(_HAZARDS), d[15]) if d[14] < 19661 else -1  # 30%
+    return (
+        _pick(len(_BIOMES), d[0]),
+        _pick(len(_LIGHTING), d[1]),
+        entity,
+        _pick(len(_DISPOSITIONS), d[5]),
+        10 + _pick(990, d[4]),
+        item,
+        10 + _pick(990, d[8]),
+        mask,
+        hazard,
+    )
+
+
+@lru_cache(maxsize=None)  # bounded by the table sizes: at most 9216 entries
+def _tile_template(b: int, lt: int, ek: int, disp: int, ik: int, hz: int) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Interned (salient_facts, hazards) for one combination of tile indices."""
+    facts = [f"{_LIGHTING[lt].replace('_', ' ').title()} {_BIOMES[b].replace('_', ' ')}"]
+    if ek >= 0:
+        facts.append(f"{_TILE_ENTITY_KINDS[ek].title()} is {_DISPOSITIONS[disp]}")
+    if ik >= 0:
+        facts.append(f"Notable item: {_ITEM_KINDS[ik].replace('_',' ')}")
+    hazards: Tuple[str, ...] = ()
+    if hz >= 0:
+        hazards = (_HAZARDS[hz],)
+        facts.append(f"Hazard: {hazards[0].replace('_',' ')}")
+    return tuple(facts), hazards
 
 
 def _generate_tile(session_id: str, x: int, y: int, z: int) -> Dict[str, Any]:
-    seed = _seed_for_tile(session_id, x, y, z)
-    rng = random.Random(seed)
-    biomes = [
-        "ruined_keep",
-        "crypt",
-        "cavern",
-        "armory",
-        "library",
-        "underground_river",
-    ]
-    biome = rng.choice(biomes)
-    lighting = rng.choice(["dark", "dim", "torchlit", "glimmering"])
-
-    entities = []
-    if rng.random() < 0.5:
-        kind = rng.choice(["goblin", "skeleton", "bat", "kobold", "slime"]) 
-        disposition = rng.choice(["hostile", "wary", "indifferent"]) 
-        entities.append({
-            "id": f"e_{kind}_{rng.randint(10, 999)}",
+    # Every random choice comes from the one keyed digest instead of seeding a
+    # Mersenne Twister per tile; _tile_indices does the int work and this
+    # wrapper maps it onto the string tables
+    digest = _tile_digest(session_id, x, y, z)
+    seed = int.from_bytes(digest[:8], "little")
+    b, lt, ek, disp, enum_, ik, inum, mask, hz = _tile_indices(_DRAWS.unpack(digest))
+    biome = _BIOMES[b]
+    lighting = _LIGHTING[lt]
+
+    entities = ()
+    if ek >= 0:
+        kind = _TILE_ENTITY_KINDS[ek]
+        entities = ({
+            "id": f"e_{kind}_{enum_}",
             "kind": kind,
-            "disposition": disposition,
-        })
+            "disposition": _DISPOSITIONS[disp],
+        },)
 
     items = []
-    if rng.random() < 0.5:
-        kind = rng.choice(["scroll", "rusty_blade", "torch", "amulet", "potion"])
+    if ik >= 0:
+        kind = _ITEM_KINDS[ik]
         items.append({
-            "id": f"it_{kind}_{rng.randint(10, 999)}",
+            "id": f"it_{kind}_{inum}",
             "kind": kind,
         })
 
-    exits = [d for d in ["north", "east", "south", "west"] if rng.random() < 0.7]
-    if not exits:
-        exits = [rng.choice(["north", "east", "south", "west"])]
-
-    hazards = []
-    if rng.random() < 0.3:
-        hazards.append(rng.choice(["loose_stones", "slick_moss", "unstable_beam"]))
-
-    salient_facts = []
-    salient_facts.append({
-        "text": f"{lighting.replace('_', ' ').title()} {biome.replace('_', ' ')}",
-        "kind": "atmosphere",
-    })
-    if entities:
-        salient_facts.append({
-            "text": f"{entities[0]['kind'].title()} is {entities[0]['disposition']}",
-            "kind": "entity",
-        })
-    if items:
-        salient_facts.append({
-            "text": f"Notable item: {items[0]['kind'].replace('_',' ')}",
-            "kind": "item",
-        })
-    if hazards:
-        salient_facts.append({
-            "text": f"Hazard: {hazards[0].replace('_',' ')}",
-            "kind": "hazard",
-        })
-
-    return {
+    facts, hazards = _tile_template(b, lt, ek, disp if ek >= 0 else 0, ik, hz)
+    # Entities are replaced rather than edited (see spawn_npc); exits, facts
+    # and hazards are tuples shared by every tile with the same template
+    tile = {
         "seed": seed,
         "tile": {
             "biome": biome,
             "lighting": lighting,
             "entities": entities,
             "items": items,
-            "exits": exits,
+            "exits": _EXITS_BY_MASK[mask],
             "hazards": hazards,
         },
-        "salient_facts": [sf["text"] for sf in salient_facts],
+        "salient_facts": facts,
+    }
+    _refresh_public(tile)
+    return tile
+
+
+def _refresh_public(tile: Dict[str, Any]) -> None:
+    """(Re)build the per-tile part of the public payload; call after editing tile."""
+    tile["_public"] = {
+        "tile": tile["tile"],
+        "salient_facts": tile["salient_facts"],
+        "exits": tile["tile"]["exits"],
     }
 
 
 def _ensure_tile(session: Dict[str, Any], x: int, y: int, z: int) -> Dict[str, Any]:
-    key = _coord_key(x, y, z)
-    tile = session["tiles"].get(key)
+    key = (x, y, z)
+    tile = session["pinned_tiles"].get(key)
+    if tile is not None:
+        return tile
+    tiles = session["tiles"]
+    tile = tiles.get(key)
     if tile is None:
         tile = _generate_tile(session["session_id"], x, y, z)
-        session["tiles"][key] = tile
+        tiles[key] = tile
+        if len(tiles) > _MAX_CACHED_TILES:
+            tiles.popitem(last=False)
+    else:
+        tiles.move_to_end(key)
+    return tile
+
+
+def _pin_tile(session: Dict[str, Any], x: int, y: int, z: int) -> Dict[str, Any]:
+    """Return the tile at x,y,z, moved out of the LRU so edits to it persist."""
+    key = (x, y, z)
+    tile = session["pinned_tiles"].get(key)
+    if tile is None:
+        tile = session["tiles"].pop(key, None) or _generate_tile(session["session_id"], x, y, z)
+        session["pinned_tiles"][key] = tile
     return tile
 
 
 def _append_event(session: Dict[str, Any], event_type: str, payload: Dict[str, Any]) -> int:
-    global _NEXT_EVENT_ID
-    eid = _NEXT_EVENT_ID
-    _NEXT_EVENT_ID += 1
-    session["events"].append({
-        "event_id": eid,
-        "type": event_type,
-        "ts": _now_iso(),
-        "payload": payload,
-    })
-    # Bound events list growth (simple cap)
-    if len(session["events"]) > 5000:
-        session["events"] = session["events"][-4000:]
+    eid = _next_event_id()
+    events = session["events"]
+    if len(events) == events.maxlen:
+        # Full ring: refill the envelope that would be evicted rather than
+        # dropping it and allocating a new one. Envelopes never leave the
+        # session, so nothing else holds a reference to it.
+        event = events.popleft()
+        event["event_id"] = eid
+        event["type"] = event_type
+        event["ts"] = _now_iso()
+        event["payload"] = payload
+    else:
+        event = {
+            "event_id": eid,
+            "type": event_type,
+            "ts": _now_iso(),
+            "payload": payload,
+        }
+    events.append(event)
     return eid
 
 
-def _rollup_journal(session: Dict[str, Any]) -> None:
+def _rollup_journal(session: Dict[str, Any], tile: Optional[Dict[str, Any]] = None) -> None:
     # Keep a rolling set of recent salient facts
-    journal = session.setdefault("journal", [])
+    journal = session["journal"]
     pos = session["position"]
-    tile = _ensure_tile(session, pos["x"], pos["y"], pos["z"])
+    if tile is None:
+        tile = _ensure_tile(session, pos["x"], pos["y"], pos["z"])
     summary = \
         f"Turn {session['turn']}: at {_coord_key(pos['x'], pos['y'], pos['z'])} — " + \
         ", ".join(tile.get("salient_facts", [])[:3])
     journal.append(summary)
-    if len(journal) > _JOURNAL_MAX_ENTRIES:
-        del journal[: max(0, len(journal) - _JOURNAL_MAX_ENTRIES)]
 
 
 def _with_session_lock(session_id: str):
-    lock = _SESSION_LOCKS.setdefault(session_id, threading.Lock())
+    # Plain get first: setdefault would build a throwaway Lock on every call
+    lock = _SESSION_LOCKS.get(session_id)
+    if lock is None:
+        with _REGISTRY_LOCK:
+            lock = _SESSION_LOCKS.setdefault(session_id, threading.Lock())
     return lock
 
 
+def _evict_sessions(keep: str) -> None:
+    """Drop the oldest idle sessions past _MAX_SESSIONS; caller holds _REGISTRY_LOCK.
+
+    Sessions that were never played (no moves, empty journal) go first. A
+    session whose lock is held by a tool call in flight is never evicted.
+    """
+    excess = len(_SESSIONS) - _MAX_SESSIONS
+    if excess <= 0:
+        return
+    idle = [sid for sid in _SESSIONS if sid not in (_ACTIVE_SESSION_ID, keep)]
+    idle.sort(key=lambda sid: _SESSIONS[sid]["turn"] > 0 or bool(_SESSIONS[sid]["journal"]))
+    for old in idle:
+        if excess <= 0:
+            break
+        lock = _SESSION_LOCKS.get(old)
+        if lock is not None and not lock.acquire(blocking=False):
+            continue
+        try:
+            session = _SESSIONS.pop(old)
+            _SESSION_LOCKS.pop(old, None)
+        finally:
+            if lock is not None:
+                lock.release()
+        excess -= 1
+        played = session["turn"] > 0 or bool(session["journal"])
+        logger.log(
+            logging.WARNING if played else logging.INFO,
+            "Evicted session %s (turn=%s, journal=%s) to stay under %s sessions",
+            old, session["turn"], len(session["journal"]), _MAX_SESSIONS,
+        )
+
+
+class NPC:
+    """Stored NPC record; slotted, since a session can hold many of them.
+
+    Tools return to_dict() so callers never hold the stored object.
+    """
+
+    __slots__ = ("id", "name", "kind", "armor_class", "max_hp", "hp", "position", "disposition")
+
+    def __init__(self, id: str, name: str, kind: str, armor_class: int, max_hp: int,
+                 position: Tuple[int, int, int], disposition: str = "hostile",
+                 hp: Optional[int] = None) -> None:
+        self.id = id
+        self.name = name
+        self.kind = kind
+        self.armor_class = armor_class
+        self.max_hp = max_hp
+        self.hp = hp  # set when combat begins
+        self.position = position  # (x, y, z)
+        self.disposition = disposition
+
+    def to_dict(self) -> Dict[str, Any]:
+        x, y, z = self.position
+        return {
+            "id": self.id,
+            "name": self.name,
+            "kind": self.kind,
+            "armor_class": self.armor_class,
+            "max_hp": self.max_hp,
+            "hp": self.hp,
+            "position": {"x": x, "y": y, "z": z},
+            "disposition": self.disposition,
+        }
+
+
 def _new_session(theme: Optional[str], tone: Optional[str], max_words: int) -> Dict[str, Any]:
     session_id = f"s_{uuid.uuid4().hex[:12]}"
     state: Dict[str, Any] = {
@@ -306,10 +513,11 @@ def _new_session(theme: Optional[str], tone: Optional[str], max_words: int) -> D
         "position": {"x": 0, "y": 0, "z": 0},
         "heading": "north",
         "turn": 0,
-        "tiles": {},
-        "events": [],
-        "journal": [],
-        "npcs": {},  # npc_id -> npc record
+        "tiles": OrderedDict(),  # (x, y, z) -> tile, least recently used first
+        "pinned_tiles": {},  # (x, y, z) -> tile edited after generation
+        "events": deque(maxlen=_EVENTS_MAX),  # ring buffer, oldest dropped
+        "journal": deque(maxlen=_JOURNAL_MAX_ENTRIES),
+        "npcs": {},  # npc_id -> NPC
         "combat": None,  # combat state when active
         "settings": {
             "theme": theme or "dungeon",
@@ -317,25 +525,35 @@ def _new_session(theme: Optional[str], tone: Optional[str], max_words: int) -> D
             "max_narrative_words": int(max_words) if max_words else 500,
         },
     }
+    # list_sessions() row; move() keeps turn/position/heading current
+    state["_summary"] = {
+        "session_id": session_id,
+        "turn": 0,
+        "position": state["position"],
+        "heading": state["heading"],
+    }
     # Ensure starting tile exists
     _ensure_tile(state, 0, 0, 0)
-    # Register session
-    _SESSIONS[session_id] = state
-    _SESSION_LOCKS.setdefault(session_id, threading.Lock())
+    # Register session, making room by dropping the oldest inactive ones
+    with _REGISTRY_LOCK:
+        _SESSIONS[session_id] = state
+        _SESSION_LOCKS.setdefault(session_id, threading.Lock())
+        _evict_sessions(session_id)
     # Event
     _append_event(state, "session_start", {"position": state["position"]})
     return state
 
 
-def _public_tile_payload(session: Dict[str, Any]) -> Dict[str, Any]:
+def _public_tile_payload(session: Dict[str, Any], tile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Public payload for the session's current tile; pass tile if already fetched."""
     pos = session["position"]
-    tile = _ensure_tile(session, pos["x"], pos["y"], pos["z"])
+    if tile is None:
+        tile = _ensure_tile(session, pos["x"], pos["y"], pos["z"])
+    # Fresh dict per call: callers add event_id and loop.py memoizes onto it
     return {
+        **tile["_public"],
         "turn": session["turn"],
         "position": pos,
-        "tile": tile["tile"],
-        "salient_facts": tile["salient_facts"],
-        "exits": tile["tile"]["exits"],
         "heading": session["heading"],
         "session_id": session["session_id"],
         "max_narrative_words": session["settings"]["max_narrative_words"],
@@ -366,23 +584,35 @@ def _public_combat(combat: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]
     }
 
 
+# Runs of anything but letters/digits (Unicode-aware, underscores included)
+_SLUG_SEP_RE = re.compile(r"[\W_]+")
+
+
 def _slugify_name(name: str) -> str:
-    base = "".join(ch.lower() if ch.isalnum() else "_" for ch in name).strip("_")
-    return "_".join(filter(None, base.split("_"))) or "foe"
+    return _SLUG_SEP_RE.sub("_", name.lower()).strip("_") or "foe"
 
 
-@mcp.tool()
+@_tool
 def summarize_file(path: str, max_lines: int = 200) -> str:
     """Return a short summary of a text file (first N non-empty lines)."""
     logger.debug("summarize_file(path=%s, max_lines=%s)", path, max_lines)
     p = Path(path)
     if not p.exists():
         raise FileNotFoundError(f"No such file: {p}")
-    lines = [ln.strip() for ln in p.read_text(encoding="utf-8").splitlines() if ln.strip()]
-    head = lines[: max(0, int(max_lines))]
-    return f"{p} — {len(lines)} total non-empty lines\n" + "\n".join(head)
-
-@mcp.tool()
+    # Stream: only the head is kept in memory; the rest is just counted
+    limit = max(0, int(max_lines))
+    head: List[str] = []
+    total = 0
+    with p.open("r", encoding="utf-8") as f:
+        for ln in f:
+            ln = ln.strip()
+            if ln:
+                total += 1
+                if total <= limit:
+                    head.append(ln)
+    return f"{p} — {total} total non-empty lines\n" + "\n".join(head)
+
+@_tool
 def function_skeleton(name: str, docstring: str = None) -> str:
     """Generate a clean, typed Python function skeleton."""
     logger.debug("function_skeleton(name=%s, has_doc=%s)", name, bool(docstring))
@@ -395,13 +625,13 @@ def function_skeleton(name: str, docstring: str = None) -> str:
         f"    pass\n"
     )
 
-@mcp.tool()
+@_tool
 def roll_dice_tool(notation: str) -> dict:
     """Roll dice using NdM notation (e.g., '2d20')."""
     logger.debug("roll_dice_tool(notation=%s)", notation)
     return roll_dice(notation)
 
-@mcp.tool()
+@_tool
 def roll_with_advantage_tool(notation: str) -> dict:
     """Roll a single die with advantage using dM notation (e.g., 'd20').
 
@@ -411,7 +641,7 @@ def roll_with_advantage_tool(notation: str) -> dict:
     return roll_with_advantage(notation)
 
 
-@mcp.tool()
+@_tool
 def start_session(theme: str = None, tone: str = None, max_narrative_words: int = 500) -> Dict[str, Any]:
     """Create a new in-memory session and return initial tile info."""
     state = _new_session(theme, tone, max_narrative_words)
@@ -421,7 +651,7 @@ def start_session(theme: str = None, tone: str = None, max_narrative_words: int
     return _public_tile_payload(state)
 
 
-@mcp.tool()
+@_tool
 def move(direction: str, session_id: str = None) -> Dict[str, Any]:
     """Move in a direction (north/south/east/west/up/down or forward/back/left/right). Returns tile info and an event_id.
 
@@ -437,29 +667,31 @@ def move(direction: str, session_id: str = None) -> Dict[str, Any]:
         heading_before = session["heading"]
         abs_dir, new_heading = _normalize_direction(direction, heading_before)
         dx, dy, dz = _DELTAS.get(abs_dir, (0, 0, 0))
-        from_pos = dict(session["position"])  # copy
-        session["position"] = {
-            "x": from_pos["x"] + dx,
-            "y": from_pos["y"] + dy,
-            "z": from_pos["z"] + dz,
-        }
+        # Position dicts are replaced, never mutated, so the old one can be
+        # kept as "from" without copying
+        from_pos = session["position"]
+        x, y, z = from_pos["x"] + dx, from_pos["y"] + dy, from_pos["z"] + dz
+        pos = session["position"] = {"x": x, "y": y, "z": z}
         session["heading"] = new_heading
         session["turn"] += 1
-        pos = session["position"]
-        _ensure_tile(session, pos["x"], pos["y"], pos["z"])
+        summary = session["_summary"]
+        summary["turn"] = session["turn"]
+        summary["position"] = pos
+        summary["heading"] = new_heading
+        tile = _ensure_tile(session, x, y, z)
         event_id = _append_event(
             session,
             "move",
-            {"from": from_pos, "to": session["position"], "dir": abs_dir, "heading": new_heading},
+            {"from": from_pos, "to": pos, "dir": abs_dir, "heading": new_heading},
         )
         if session["turn"] % _TURN_JOURNAL_ROLLUP_INTERVAL == 0:
-            _rollup_journal(session)
-        payload = _public_tile_payload(session)
+            _rollup_journal(session, tile)
+        payload = _public_tile_payload(session, tile)
         payload["event_id"] = event_id
         return payload
 
 
-@mcp.tool()
+@_tool
 def look(session_id: str = None) -> Dict[str, Any]:
     """Return current tile info for the session without moving. Uses active session if none provided."""
     sid = session_id or _ACTIVE_SESSION_ID
@@ -472,7 +704,7 @@ def look(session_id: str = None) -> Dict[str, Any]:
         return _public_tile_payload(session)
 
 
-@mcp.tool()
+@_tool
 def log_narrative(text: str, event_id: int, session_id: str = None) -> Dict[str, Any]:
     """Record the model's narrative for a prior event (e.g., move). Uses active session if none provided."""
     sid = session_id or _ACTIVE_SESSION_ID
@@ -488,13 +720,11 @@ def log_narrative(text: str, event_id: int, session_id: str = None) -> Dict[str,
         # Append a very short journal line based on narrative head
         snippet = (text or "").strip().splitlines()[0][:120]
         if snippet:
-            session.setdefault("journal", []).append(f"Turn {session['turn']}: {snippet}")
-            if len(session["journal"]) > _JOURNAL_MAX_ENTRIES:
-                del session["journal"][: max(0, len(session["journal"]) - _JOURNAL_MAX_ENTRIES)]
+            session["journal"].append(f"Turn {session['turn']}: {snippet}")
         return {"ok": True, "logged_event_id": eid}
 
 
-@mcp.tool()
+@_tool
 def journal(session_id: str = None) -> Dict[str, Any]:
     """Return a concise rolling summary of the session for context refresh. Uses active session if none provided."""
     sid = session_id or _ACTIVE_SESSION_ID
@@ -504,11 +734,11 @@ def journal(session_id: str = None) -> Dict[str, Any]:
     lock = _with_session_lock(sid)
     with lock:
         session = _SESSIONS[sid]
-        lines = session.get("journal", [])[-_JOURNAL_MAX_ENTRIES :]
+        lines = list(session["journal"])
         return {"turn": session["turn"], "summary": lines}
 
 
-@mcp.tool()
+@_tool
 def spawn_npc(name: str = None, kind: str = None, session_id: str = None) -> Dict[str, Any]:
     """Spawn an enemy NPC at the current tile. Returns npc details and a short message.
 
@@ -524,29 +754,22 @@ def spawn_npc(name: str = None, kind: str = None, session_id: str = None) -> Dic
     with lock:
         session = _SESSIONS[sid]
         pos = session["position"]
-        tile = _ensure_tile(session, pos["x"], pos["y"], pos["z"])
+        tile = _pin_tile(session, pos["x"], pos["y"], pos["z"])
         rng = random.Random(_seed_for_tile(sid, pos["x"], pos["y"], pos["z"]) ^ int(time.time()))
-        k = (kind or rng.choice(["goblin", "skeleton", "kobold", "bandit", "slime"]))
+        k = (kind or rng.choice(_NPC_KINDS))
         nm = name or f"{k.title()} {_slugify_name(uuid.uuid4().hex[:4])}"
         armor_class = rng.randint(10, 15)
         npc_id = f"npc_{_slugify_name(nm)}_{uuid.uuid4().hex[:6]}"
-        npc = {
-            "id": npc_id,
-            "name": nm,
-            "kind": k,
-            "armor_class": armor_class,
-            "max_hp": rng.randint(8, 20),
-            "hp": None,  # set when combat begins
-            "position": dict(pos),
-            "disposition": "hostile",
-        }
-        session["npcs"][npc_id] = npc
+        session["npcs"][npc_id] = record = NPC(
+            npc_id, nm, k, armor_class, rng.randint(8, 20), (pos["x"], pos["y"], pos["z"])
+        )
+        npc = record.to_dict()
         # Also reflect presence in current tile's entities list non-destructively
         ent = {"id": npc_id, "kind": k, "disposition": "hostile", "name": nm}
         # Avoid duplicate entity entries with same id
-        entities = [e for e in tile["tile"].get("entities", []) if e.get("id") != npc_id]
-        entities.append(ent)
-        tile["tile"]["entities"] = entities
+        entities = tuple(e for e in tile["tile"].get("entities", ()) if e.get("id") != npc_id)
+        tile["tile"]["entities"] = entities + (ent,)
+        _refresh_public(tile)
 
         event_id = _append_event(session, "spawn_npc", {"npc": npc})
         msg = f"{nm} stands before you, watching your every move. Armor Class: {armor_class}."
@@ -554,7 +777,7 @@ def spawn_npc(name: str = None, kind: str = None, session_id: str = None) -> Dic
         return {"npc": npc, "message": msg, "event_id": event_id}
 
 
-@mcp.tool()
+@_tool
 def get_npc(npc_id: str, session_id: str = None) -> Dict[str, Any]:
     """Fetch an NPC by id from session memory."""
     sid = session_id or _ACTIVE_SESSION_ID
@@ -567,10 +790,10 @@ def get_npc(npc_id: str, session_id: str = None) -> Dict[str, Any]:
         npc = session["npcs"].get(npc_id)
         if not npc:
             raise ValueError("Unknown npc_id")
-        return {"npc": npc}
+        return {"npc": npc.to_dict()}
 
 
-@mcp.tool()
+@_tool
 def get_active_session() -> Dict[str, Any]:
     """Return the current active session_id and a brief status."""
     sid = _ACTIVE_SESSION_ID
@@ -581,7 +804,7 @@ def get_active_session() -> Dict[str, Any]:
     return {"session_id": sid, "turn": s["turn"], "position": s["position"], "heading": s["heading"]}
 
 
-@mcp.tool()
+@_tool
 def set_active_session(session_id: str) -> Dict[str, Any]:
     """Set the active session_id for subsequent calls that omit session_id."""
     if session_id not in _SESSIONS:
@@ -593,23 +816,17 @@ def set_active_session(session_id: str) -> Dict[str, Any]:
     return {"session_id": session_id, "turn": s["turn"], "position": s["position"], "heading": s["heading"]}
 
 
-@mcp.tool()
+@_tool
 def list_sessions() -> Dict[str, Any]:
     """List all session ids with brief statuses."""
-    data = []
-    for sid, s in _SESSIONS.items():
-        data.append({
-            "session_id": sid,
-            "turn": s["turn"],
-            "position": s["position"],
-            "heading": s["heading"],
-            "active": sid == _ACTIVE_SESSION_ID,
-        })
+    active = _ACTIVE_SESSION_ID
+    with _REGISTRY_LOCK:
+        data = [{**s["_summary"], "active": sid == active} for sid, s in _SESSIONS.items()]
     logger.info("list_sessions -> %s sessions (active=%s)", len(data), _ACTIVE_SESSION_ID)
     return {"sessions": data}
 
 
-@mcp.tool()
+@_tool
 def end_session(session_id: str = None) -> Dict[str, Any]:
     """End a session and remove it from memory. If omitted, uses the active session."""
     global _ACTIVE_SESSION_ID
@@ -619,28 +836,30 @@ def end_session(session_id: str = None) -> Dict[str, Any]:
     if sid not in _SESSIONS:
         raise ValueError("Unknown session_id")
     # Acquire and remove lock then delete state
-    lock = _SESSION_LOCKS.setdefault(sid, threading.Lock())
+    lock = _with_session_lock(sid)
     with lock:
         logger.info("end_session -> %s", sid)
-        _SESSIONS.pop(sid, None)
-        _SESSION_LOCKS.pop(sid, None)
+        with _REGISTRY_LOCK:
+            _SESSIONS.pop(sid, None)
+            _SESSION_LOCKS.pop(sid, None)
     if _ACTIVE_SESSION_ID == sid:
         _ACTIVE_SESSION_ID = None
     return {"ok": True, "ended": sid}
 
 
-@mcp.tool()
+@_tool
 def reset_all() -> Dict[str, Any]:
     """Clear all sessions and reset active session id."""
     logger.info("reset_all()")
-    _SESSIONS.clear()
-    _SESSION_LOCKS.clear()
+    with _REGISTRY_LOCK:
+        _SESSIONS.clear()
+        _SESSION_LOCKS.clear()
     global _ACTIVE_SESSION_ID
     _ACTIVE_SESSION_ID = None
     return {"ok": True}
 
 
-@mcp.tool()
+@_tool
 def tools_help() -> str:
     """Human-friendly list of available tools and aliases with examples."""
     lines = [
@@ -671,62 +890,62 @@ def tools_help() -> str:
 
 # ---------- CamelCase alias tools (for nicer UX) ----------
 
-@mcp.tool()
+@_tool
 def startSession(theme: str = None, tone: str = None, maxNarrativeWords: int = 500) -> Dict[str, Any]:
     return start_session(theme=theme, tone=tone, max_narrative_words=maxNarrativeWords)
 
 
-@mcp.tool()
+@_tool
 def moveDir(direction: str, sessionId: str = None) -> Dict[str, Any]:
     return move(direction=direction, session_id=sessionId)
 
 
-@mcp.tool()
+@_tool
 def lookAround(sessionId: str = None) -> Dict[str, Any]:
     return look(session_id=sessionId)
 
 
-@mcp.tool()
+@_tool
 def logNarrative(text: str, eventId: int, sessionId: str = None) -> Dict[str, Any]:
     return log_narrative(text=text, event_id=eventId, session_id=sessionId)
 
 
-@mcp.tool()
+@_tool
 def journalSummary(sessionId: str = None) -> Dict[str, Any]:
     return journal(session_id=sessionId)
 
 
-@mcp.tool()
+@_tool
 def getActiveSession() -> Dict[str, Any]:
     return get_active_session()
 
 
-@mcp.tool()
+@_tool
 def setActiveSession(sessionId: str) -> Dict[str, Any]:
     return set_active_session(session_id=sessionId)
 
 
-@mcp.tool()
+@_tool
 def listSessions() -> Dict[str, Any]:
     return list_sessions()
 
 
-@mcp.tool()
+@_tool
 def spawnNpc(name: str = None, kind: str = None, sessionId: str = None) -> Dict[str, Any]:
     return spawn_npc(name=name, kind=kind, session_id=sessionId)
 
 
-@mcp.tool()
+@_tool
 def getNpc(npcId: str, sessionId: str = None) -> Dict[str, Any]:
     return get_npc(npc_id=npcId, session_id=sessionId)
 
 
-@mcp.tool()
+@_tool
 def endSession(sessionId: str = None) -> Dict[str, Any]:
     return end_session(session_id=sessionId)
 
 
-@mcp.tool()
+@_tool
 def resetAll() -> Dict[str, Any]:
     return reset_all()
 
@@ -758,7 +977,7 @@ def _append_combat_log(session: Dict[str, Any], text: str) -> None:
         combat["log"] = combat["log"][-150:]
 
 
-@mcp.tool()
+@_tool
 def generate_encounter(name: str = None, kind: str = None, session_id: str = None) -> Dict[str, Any]:
     """Create a simple combat encounter at current tile by spawning one enemy and starting combat.
 
@@ -775,9 +994,12 @@ def generate_encounter(name: str = None, kind: str = None, session_id: str = Non
     with lock:
         session = _SESSIONS[sid]
         combat = _ensure_combat(session)
-        # Set HP for the spawned npc if not set
+        # Set HP for the spawned npc if not set, on the stored record too
         hp = npc.get("max_hp") or 12
         npc["hp"] = npc.get("hp") or hp
+        record = session["npcs"].get(npc["id"])
+        if record is not None:
+            record.hp = npc["hp"]
         enemy = {
             "id": npc["id"],
             "name": npc.get("name"),
@@ -800,7 +1022,7 @@ def generate_encounter(name: str = None, kind: str = None, session_id: str = Non
         return tile_payload
 
 
-@mcp.tool()
+@_tool
 def attack(weapon: str = "attack", damage: str = "1d6", advantage: bool = False, disadvantage: bool = False, player_roll: int = None, session_id: str = None) -> Dict[str, Any]:
     """Resolve a player attack roll against the first enemy. Uses '!roll d20' semantics and damage NdM.
 
@@ -892,7 +1114,7 @@ def attack(weapon: str = "attack", damage: str = "1d6", advantage: bool = False,
         return payload
 
 
-@mcp.tool()
+@_tool
 def combat_status(session_id: str = None) -> Dict[str, Any]:
     """Return current combat state summary."""
     sid = session_id or _ACTIVE_SESSION_ID
@@ -902,7 +1124,7 @@ def combat_status(session_id: str = None) -> Dict[str, Any]:
     return {"combat": _public_combat(session.get("combat"))}
 
 
-@mcp.tool()
+@_tool
 def combat_end(session_id: str = None) -> Dict[str, Any]:
     """End combat and clear state from session."""
     sid = session_id or _ACTIVE_SESSION_ID
@@ -916,7 +1138,7 @@ def combat_end(session_id: str = None) -> Dict[str, Any]:
         return {"ok": True, "event_id": event_id, "message": "The battle is finished."}
 
 
-@mcp.tool()
+@_tool
 def health() -> dict:
     """Return a small status payload to confirm the server is responsive."""
     info = {
@@ -926,20 +1148,20 @@ def health() -> dict:
         "cwd": str(Path.cwd()),
         "python": sys.version.split()[0],
         "platform": platform.platform(),
-        "tools": _TOOL_NAMES + _TOOL_ALIASES + ["tools_help"],
+        "tools": _ALL_TOOL_NAMES,
     }
     logger.debug("health() -> %s", info)
     return info
 
 
-@mcp.tool()
+@_tool
 def ping() -> str:
     """Simple liveness check. Returns 'pong'."""
     logger.debug("ping()")
     return "pong"
 
 
-@mcp.tool()
+@_tool
 def echo(text: str) -> str:
     """Echo the provided text. Useful to verify round-trip plumbing."""
     logger.debug("echo(text_len=%s)", len(text))
@@ -952,4 +1174,4 @@ if __name__ == "__main__":
     )
     logger.info("Tools available: %s", ", ".join(_TOOL_NAMES))
     logger.info("Aliases available: %s", ", ".join(_TOOL_ALIASES + ["tools_help"]))
-    mcp.run()
+    _get_server().run()
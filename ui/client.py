@@ -59,8 +59,8 @@ class GameClient:
     def npc(self, npc_id: str) -> Dict[str, Any]:
         return getNpc(npc_id)
 
-    def log(self, text: str, event_id: int) -> Dict[str, Any]:
-        return logNarrative(text=text, eventId=event_id)
+    def log(self, text: str, event_id: int, session_id: Optional[str] = None) -> Dict[str, Any]:
+        return logNarrative(text=text, eventId=event_id, sessionId=session_id)
 
     # ---- Combat wrappers ----
     def generate_encounter(self, name: Optional[str] = None, kind: Optional[str] = None) -> Dict[str, Any]:
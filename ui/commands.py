@@ -1,8 +1,16 @@
 from __future__ import annotations
 
+import re
 from dataclasses import dataclass
 from typing import Callable, Optional, Dict, Any, List
 
+# One anchored match picks the dispatch branch: natural aliases (any case),
+# a colon command, a dice shortcut handled elsewhere, or a bare "!roll..."
+# that falls through to the command table
+_PREFIX_RE = re.compile(
+    r"(?P<go>(?i:go) )|(?P<move>(?i:move) )|(?P<cmd>:)|(?P<dice>!roll(?:-a)? )|(?P<bang>!roll)"
+)
+
 
 @dataclass
 class CommandSpec:
@@ -31,16 +39,16 @@ class CommandRouter:
         s = (raw or "").strip()
         if not s:
             return False
+        m = _PREFIX_RE.match(s)
+        if m is None:
+            return False
+        kind = m.lastgroup
         # Normalize natural aliases
-        if s.lower().startswith("go "):
-            s = ":move " + s.split(" ", 1)[1]
-        if s.lower().startswith("move ") and not s.startswith(":"):
+        if kind == "go":
+            s = ":move " + s[m.end():]
+        elif kind == "move":
             s = ":" + s
-
-        if not s.startswith(":") and not s.startswith("!roll"):
-            return False
-
-        if s.startswith("!roll-a ") or s.startswith("!roll "):
+        elif kind == "dice":
             # handled outside (dice helpers)
             return False
 
@@ -1,10 +1,17 @@
 from __future__ import annotations
 
+import concurrent.futures
+import inspect
 import json
 import os
+import queue
+import shlex
+from collections import deque
+from contextlib import nullcontext
+from functools import lru_cache
 import time
 import threading
-from typing import Optional, List
+from typing import Any, Callable, Deque, Dict, Optional, List, Tuple
 
 from textual.app import App, ComposeResult
 import re
@@ -25,12 +32,141 @@ except Exception:
         from textual.widgets import Log as TranscriptWidget  # type: ignore
         _TRANSCRIPT_KW = {"highlight": True}
         _TRANSCRIPT_SUPPORTS_MARKUP = False
+try:
+    _TRANSCRIPT_PARAMS = frozenset(inspect.signature(TranscriptWidget.__init__).parameters)
+except (TypeError, ValueError):  # pragma: no cover - uninspectable widget
+    _TRANSCRIPT_PARAMS = frozenset()
+# TextLog/RichLog with wrap=True wrap markup text themselves at render time;
+# only the plain Log needs on_mount's Python wrap/markup-strip fallback
+_TRANSCRIPT_NATIVE_WRAP = _TRANSCRIPT_SUPPORTS_MARKUP and "wrap" in _TRANSCRIPT_PARAMS
+# Bound the transcript buffer so long sessions don't slow every refresh.
+# RichLog/TextLog/Log take max_lines on recent Textual; otherwise _write_block
+# counts lines and clears the widget past the cap.
+_TRANSCRIPT_MAX_LINES = 5000
+_TRANSCRIPT_NATIVE_CAP = "max_lines" in _TRANSCRIPT_PARAMS
+if _TRANSCRIPT_NATIVE_CAP:
+    _TRANSCRIPT_KW = {**_TRANSCRIPT_KW, "max_lines": _TRANSCRIPT_MAX_LINES}
 from textual.containers import Horizontal, Vertical
 from textual.reactive import reactive
 
+from tools.dnd_tools import roll_dice, roll_with_advantage
+
 from .client import GameClient
 from .commands import CommandRouter, CommandSpec
 
+# Imported once here rather than per LLM call; narration works without it
+try:  # optional: LLM narrative via a local Ollama server
+    import ollama  # type: ignore
+    _OLLAMA_IMPORT_ERROR: Optional[Exception] = None
+except Exception as e:  # pragma: no cover - optional dependency
+    ollama = None
+    _OLLAMA_IMPORT_ERROR = e
+
+
+try:  # optional: C-implemented JSON encoder for the :raw payload dumps
+    import orjson
+
+    def _jdumps(obj) -> str:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+        except orjson.JSONEncodeError:
+            # e.g. non-str keys or ints beyond 64 bits, which stdlib json accepts
+            return json.dumps(obj, indent=2, ensure_ascii=False)
+except Exception:  # pragma: no cover - optional dependency
+    def _jdumps(obj) -> str:
+        return json.dumps(obj, indent=2, ensure_ascii=False)
+
+# Rich markup tags, stripped when the transcript widget can't render them
+_MARKUP_RE = re.compile(r"\[[^\]]+\]")
+
+
+# Queued narrative logs recorded per worker pass
+_LOG_BATCH = 32
+
+# Free-form chat exchanges (user + assistant) kept as model context
+_CHAT_HISTORY_TURNS = 16
+
+# Streamed replies reach the transcript at most this often, and a partial line
+# longer than _STREAM_SOFT_LINE chars is flushed at its last space
+_STREAM_FLUSH_S = 0.05
+_STREAM_SOFT_LINE = 160
+
+
+@lru_cache(maxsize=8)
+def _long_run_re(width: int) -> "re.Pattern[str]":
+    """Unbroken runs (no whitespace) longer than `width`."""
+    return re.compile(rf"\S{{{width + 1},}}")
+
+
+def _wrap_line(wrapper: textwrap.TextWrapper, line: str, width: int) -> List[str]:
+    """Wrap one line, slicing runs longer than `width` by hand.
+
+    textwrap is quadratic on long unbroken tokens (base64, URLs, minified
+    JSON), so those are cut into width pieces directly and only the text
+    between them goes through the wrapper.
+    """
+    out: List[str] = []
+    seg = ""
+    pos = 0
+    for m in _long_run_re(width).finditer(line):
+        seg += line[pos:m.start()]
+        if seg:
+            out.extend(wrapper.wrap(seg))
+        run = m.group()
+        cut = len(run) - len(run) % width
+        out.extend(run[i:i + width] for i in range(0, cut, width))
+        seg = run[cut:]  # short tail shares a line with what follows
+        pos = m.end()
+    seg += line[pos:]
+    if seg:
+        out.extend(wrapper.wrap(seg))
+    return out or [""]
+
+
+class _DaemonPool:
+    """A few daemon worker threads running submitted calls in FIFO order.
+
+    submit() returns a concurrent.futures.Future, so callers can cancel work
+    that hasn't started. Unlike ThreadPoolExecutor, whose workers are joined
+    at interpreter exit, a worker stuck in a blocking model call never holds
+    up quitting the app.
+    """
+
+    def __init__(self, workers: int, name: str) -> None:
+        self._q: "queue.Queue[Optional[Tuple[concurrent.futures.Future, Callable[..., Any], tuple]]]" = queue.Queue()
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"{name}_{i}", daemon=True).start()
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> concurrent.futures.Future:
+        fut: concurrent.futures.Future = concurrent.futures.Future()
+        self._q.put((fut, fn, args))
+        return fut
+
+    def shutdown(self) -> None:
+        """Cancel queued calls and stop the workers once their current call returns."""
+        while True:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[0].cancel()
+        self._q.put(None)
+
+    def _work(self) -> None:
+        while True:
+            item = self._q.get()
+            if item is None:
+                self._q.put(None)  # pass the stop on to the next worker
+                return
+            fut, fn, args = item
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                fut.set_result(fn(*args))
+            except BaseException as e:
+                fut.set_exception(e)
+
 
 class Actions(Static):
     pass
@@ -72,12 +208,53 @@ class GameTUI(App):
         self.client = GameClient()
         self.router = CommandRouter()
         self._register_commands()
+        # The command set is fixed once registered; set to None to rebuild
+        self._actions_text: Optional[str] = None
         self._last_command: Optional[str] = None
         # LLM settings
         self.llm_enabled: bool = True
         self.llm_model: str = os.getenv("OLLAMA_MODEL", "dnd-writer")
-        # Keep a lightweight chat history for free-form messages
-        self.chat_history: List[dict] = []
+        # Keep a lightweight chat history for free-form messages: the last
+        # _CHAT_HISTORY_TURNS exchanges, so prompts stop growing with the session
+        self.chat_history: Deque[dict] = deque(maxlen=2 * _CHAT_HISTORY_TURNS)
+        # Chats typed while one is in flight, oldest first. Chats run one at a
+        # time so each prompt includes the exchange before it (UI thread only)
+        self._chat_pending: Deque[str] = deque()
+        self._chat_busy = False
+        # One ollama.Client (and connection pool) for every LLM call; built on
+        # first use, and a failure is remembered rather than retried
+        self._ollama_client = None
+        self._ollama_error: Optional[Exception] = None
+        self._ollama_lock = threading.Lock()
+        # LLM calls share two worker threads instead of a thread per event, so
+        # a burst of moves can't pile concurrent requests onto the model
+        self._llm_pool = _DaemonPool(2, "llm")
+        # Set on unmount; replies still streaming stop and close their stream
+        self._shutting_down = threading.Event()
+        # Held by the reply streaming into the transcript, so two replies'
+        # partial lines never interleave
+        self._stream_lock = threading.Lock()
+        # Newest tile narration; a newer tile cancels it if it hasn't started
+        self._latest_narration: Optional[concurrent.futures.Future] = None
+        # Work for the log worker; None stops it. Narratives are (session_id,
+        # text, event_id) with the narrated tile's session, not whichever is
+        # active at drain time; a callable (e.g. the :journal fetch) runs
+        # after the narratives queued before it
+        self._log_q: "queue.Queue[Optional[Any]]" = queue.Queue()
+        # Lines written so far, when the widget has no max_lines of its own
+        self._transcript_lines = 0
+        # Latest status markup not yet shown; flushed by a ~30 Hz timer
+        self._pending_status: Optional[str] = None
+        # Transcript wrap width, re-read on resize rather than on every write
+        self._wrap_width = 80
+        # TextWrapper per transcript width; cleared on resize
+        self._wrapper_cache: Dict[int, textwrap.TextWrapper] = {}
+        # Prompt messages that only change with max_words / the last tile:
+        # chat system message per max_words, (tile, max_words, grounding) for
+        # the last tile chatted about, and the last narrate system message
+        self._system_cache: Dict[int, dict] = {}
+        self._grounding_cache: Optional[tuple] = None
+        self._narrate_system_cache: Optional[tuple] = None
 
     def _register_commands(self) -> None:
         self.router.register(CommandSpec("start", "Start a new session", self._cmd_start, "Ctrl+N"))
@@ -101,7 +278,9 @@ class GameTUI(App):
     def compose(self) -> ComposeResult:
         yield Header(show_clock=True)
         with Horizontal(id="body"):
-            left = Actions(id="actions")
+            # Side panes are kept on self like transcript/status/input, so
+            # renders don't go through query_one's selector matching
+            self.actions_widget = left = Actions(id="actions")
             try:
                 left.can_focus = False
             except Exception:
@@ -114,7 +293,7 @@ class GameTUI(App):
             except Exception:
                 pass
             yield self.transcript
-            right = Context(id="context")
+            self.context_widget = right = Context(id="context")
             try:
                 right.can_focus = False
             except Exception:
@@ -129,6 +308,8 @@ class GameTUI(App):
         yield Footer()
 
     def on_mount(self) -> None:
+        self.set_interval(1 / 30, self._flush_status)
+        threading.Thread(target=self._log_worker, name="narrative-log", daemon=True).start()
         self._render_actions()
         self._render_context()
         llm_hint = " — LLM off (toggle with :llm on)" if not self.llm_enabled else " — LLM on"
@@ -139,35 +320,98 @@ class GameTUI(App):
             self.call_after_refresh(lambda: self.set_focus(self.input))
         except Exception:
             self.set_focus(self.input)
-        # Install a compatibility write wrapper to ensure wrapping/newlines even on older Textual
+        # Install a compatibility write wrapper to ensure wrapping/newlines even
+        # on older Textual; a natively wrapping log keeps its own write
+        if _TRANSCRIPT_NATIVE_WRAP:
+            return
+        try:
+            self.call_after_refresh(self._update_wrap_width)
+        except Exception:
+            self._update_wrap_width()
         try:
             original_write = self.transcript.write  # type: ignore[attr-defined]
 
             def _compat_write(msg: str) -> None:
-                try:
-                    width = max(20, (self.transcript.size.width or 80) - 2)  # type: ignore[attr-defined]
-                except Exception:
-                    width = 80
+                width = self._wrap_width
                 text = str(msg)
                 if not _TRANSCRIPT_SUPPORTS_MARKUP:
-                    text = re.sub(r"\[[^\]]+\]", "", text)
-                # Write each logical line wrapped to the current width
-                lines = text.splitlines() or [""]
-                for line in lines:
-                    wrapped = textwrap.wrap(
-                        line,
-                        width=width,
-                        replace_whitespace=False,
-                        drop_whitespace=False,
-                    ) or [""]
-                    for w in wrapped:
-                        original_write(w)
+                    text = _MARKUP_RE.sub("", text)
+                # Wrap each logical line to the current width, then hand the
+                # whole block over in one write so the log refreshes once
+                wrapper = self._get_wrapper(width)
+                out: List[str] = []
+                for line in text.splitlines() or [""]:
+                    if len(line) > width:
+                        out.extend(_wrap_line(wrapper, line, width))
+                    else:
+                        out.extend(wrapper.wrap(line) or [""])
+                original_write("\n".join(out))
 
             # Override instance method to route through compatibility wrapper
             self.transcript.write = _compat_write  # type: ignore[assignment]
         except Exception:
             pass
 
+    def _get_wrapper(self, width: int) -> textwrap.TextWrapper:
+        # Built once per width instead of a textwrap.wrap() call (and a new
+        # TextWrapper) per line; no hyphen splitting, which is the costly regex
+        wrapper = self._wrapper_cache.get(width)
+        if wrapper is None:
+            wrapper = self._wrapper_cache[width] = textwrap.TextWrapper(
+                width=width,
+                replace_whitespace=False,
+                drop_whitespace=False,
+                break_on_hyphens=False,
+                break_long_words=True,
+            )
+        return wrapper
+
+    def on_resize(self, event) -> None:
+        # Old widths won't come back soon; drop their wrappers. The transcript
+        # has its new size only after the relayout, so re-read it then
+        self._wrapper_cache.clear()
+        try:
+            self.call_after_refresh(self._update_wrap_width)
+        except Exception:
+            self._update_wrap_width()
+
+    def _update_wrap_width(self) -> None:
+        try:
+            self._wrap_width = max(20, (self.transcript.size.width or 80) - 2)  # type: ignore[attr-defined]
+        except Exception:
+            self._wrap_width = 80
+
+    def on_unmount(self) -> None:
+        self._shutting_down.set()
+        self._llm_pool.shutdown()
+        self._log_q.put(None)
+
+    def _log_worker(self) -> None:
+        # Records narratives off the LLM threads, draining whatever queued up
+        # meanwhile in one pass (same shape as loop.py's worker)
+        while True:
+            batch = [self._log_q.get()]
+            while len(batch) < _LOG_BATCH:
+                try:
+                    batch.append(self._log_q.get_nowait())
+                except queue.Empty:
+                    break
+            for item in batch:
+                if callable(item):
+                    try:
+                        item()
+                    except Exception:
+                        pass
+                elif item is not None:
+                    try:
+                        session_id, text, event_id = item
+                        self.client.log(text, event_id, session_id)
+                    except Exception:
+                        pass
+                self._log_q.task_done()
+            if batch[-1] is None:
+                return
+
     def action_focus_input(self) -> None:
         # Focus input and seed a colon for quick commands
         self.set_focus(self.input)
@@ -176,76 +420,170 @@ class GameTUI(App):
 
     # ---------- Helpers ----------
 
+    def _set_status(self, markup: str) -> None:
+        # Only the newest status matters, so bursts (streamed narration,
+        # rapid attacks) collapse into one status render per timer tick
+        self._pending_status = markup
+
+    def _flush_status(self) -> None:
+        markup = self._pending_status
+        if markup is not None:
+            self._pending_status = None
+            self.status.update(markup)
+
     def _info(self, msg: str) -> None:
         # concise status near input, include last command if present
         if self._last_command:
-            self.status.update(f"[bold]You:[/] {self._last_command}\n[bold cyan]ℹ️  {msg}[/]")
+            self._set_status(f"[bold]You:[/] {self._last_command}\n[bold cyan]ℹ️  {msg}[/]")
         else:
-            self.status.update(f"[bold cyan]ℹ️  {msg}[/]")
+            self._set_status(f"[bold cyan]ℹ️  {msg}[/]")
 
     def _error(self, msg: str) -> None:
         if self._last_command:
-            self.status.update(f"[bold]You:[/] {self._last_command}\n[bold red]❌ {msg}[/]")
+            self._set_status(f"[bold]You:[/] {self._last_command}\n[bold red]❌ {msg}[/]")
         else:
-            self.status.update(f"[bold red]❌ {msg}[/]")
+            self._set_status(f"[bold red]❌ {msg}[/]")
+
+    def _write_block(self, lines: List[str]) -> None:
+        # One transcript write (and one refresh) for a whole block of lines
+        self._write_text("\n".join(lines))
+
+    def _write_text(self, block: str) -> None:
+        # Every transcript write goes through here so the line cap sees it
+        if not _TRANSCRIPT_NATIVE_CAP:
+            n = block.count("\n") + 1
+            self._transcript_lines += n
+            if self._transcript_lines > _TRANSCRIPT_MAX_LINES:
+                self.transcript.clear()
+                self._transcript_lines = n
+        self.transcript.write(block)
+
+    def _batch(self):
+        # Coalesce the refreshes of several widget updates; older Textual
+        # versions without batch_update just update as they go
+        batch_update = getattr(self, "batch_update", None)
+        return batch_update() if batch_update is not None else nullcontext()
 
     def _print_tile(self, payload: dict) -> None:
         pos = payload.get("position", {})
-        exits = ", ".join(payload.get("exits", []))
-        facts = "; ".join(payload.get("salient_facts", [])[:3])
+        exits = ", ".join(payload.get("exits", ()))
+        facts = "; ".join(payload.get("salient_facts", ())[:3])
         heading = payload.get("heading", "?")
         pos_str = f"({pos.get('x','?')}, {pos.get('y','?')}, {pos.get('z','?')})"
-        self.transcript.write("")
-        self.transcript.write(f"[b]🏰 {pos_str} facing {heading}[/]")
-        self.transcript.write(f"📍 Exits: {exits}")
-        self.transcript.write(f"📝 {facts}")
-        self.transcript.write("")
+        self._write_block([
+            "",
+            f"[b]🏰 {pos_str} facing {heading}[/]",
+            f"📍 Exits: {exits}",
+            f"📝 {facts}",
+            "",
+        ])
 
     def _json_block(self, title: str, payload: dict) -> None:
         # pretty-print JSON payload in the center transcript
         try:
-            dumped = json.dumps(payload, indent=2, ensure_ascii=False)
+            dumped = _jdumps(payload)
         except Exception:
             dumped = str(payload)
-        # visual separation
-        self.transcript.write("")
-        self.transcript.write(f"[b]{title}[/]")
-        for line in dumped.splitlines():
-            self.transcript.write(f"  {line}")
-        self.transcript.write("")
+        # visual separation; indent every line in one replace, one write
+        self._write_text(f"\n[b]{title}[/]\n  " + dumped.replace("\n", "\n  ") + "\n")
 
     def _print_streaming(self, title: str = "DM", hint: str = "Generating…") -> None:
         # Show a lightweight streaming indicator in the center transcript
         try:
-            self.transcript.write("")
-            self.transcript.write(f"[b]{title}[/]")
-            self.transcript.write(f"[dim]⏳ {hint}[/]")
-            self.transcript.write("")
+            self._write_block(["", f"[b]{title}[/]", f"[dim]⏳ {hint}[/]", ""])
         except Exception:
             pass
 
-    def _print_narrative(self, text: str) -> None:
-        # human-readable DM narrative in center panel
-        self.transcript.write("")  # ensure separation from prior tool output
-        self.transcript.write("[b]DM[/]")
-        for line in (text or "").splitlines():
-            self.transcript.write(line)
-        self.transcript.write("")
+    def _stream_reply(self, resp) -> str:
+        """Write a streamed chat reply to the transcript as it arrives (worker thread).
+
+        Every transcript write starts a new line, so only complete lines (or
+        a long partial line cut at a space) are flushed, at most every
+        _STREAM_FLUSH_S. Only one reply streams at a time; a reply that
+        arrives while another is streaming is buffered and written as one
+        block once that one finishes. Returns the full reply text; once the
+        app is closing, reading stops and the stream is closed.
+        """
+        try:
+            if not self._stream_lock.acquire(blocking=False):
+                text = "".join(self._chunks(resp))
+                with self._stream_lock:
+                    self.call_from_thread(self._write_block, ["", "[b]DM[/]"] + text.split("\n") + [""])
+                return text
+            try:
+                return self._stream_live(resp)
+            finally:
+                self._stream_lock.release()
+        finally:
+            close = getattr(resp, "close", None)
+            if close is not None:
+                close()  # drops the HTTP response if we stopped reading early
+
+    def _chunks(self, resp):
+        # Content pieces of a streamed reply, ending early once the app closes
+        for chunk in resp:
+            if self._shutting_down.is_set():
+                return
+            yield chunk.get("message", {}).get("content", "")
+
+    def _stream_live(self, resp) -> str:
+        # Body of _stream_reply for the reply holding _stream_lock
+        parts: List[str] = []
+        pending = ""
+        # Blank line first to separate the reply from prior tool output
+        head = ["", "[b]DM[/]"]
+        last = time.monotonic()
+        for piece in self._chunks(resp):
+            if not piece:
+                continue
+            parts.append(piece)
+            pending += piece
+            now = time.monotonic()
+            if now - last < _STREAM_FLUSH_S:
+                continue
+            cut = pending.rfind("\n")
+            if cut < 0 and len(pending) > _STREAM_SOFT_LINE:
+                cut = pending.rfind(" ")
+            if cut < 0:
+                continue
+            lines, pending = pending[:cut].split("\n"), pending[cut + 1:]
+            self.call_from_thread(self._write_block, head + lines)
+            head = []
+            last = now
+        tail = pending.split("\n") if pending else []
+        self.call_from_thread(self._write_block, head + tail + [""])
+        return "".join(parts)
 
     # ---------- LLM (Ollama) narrative ----------
 
+    @property
+    def ollama_client(self):
+        """The shared ollama.Client, or None if ollama can't be used (see _ollama_error)."""
+        with self._ollama_lock:  # narration and chat threads may race here
+            if self._ollama_client is None and self._ollama_error is None:
+                if ollama is None:
+                    self._ollama_error = _OLLAMA_IMPORT_ERROR
+                else:
+                    try:
+                        self._ollama_client = ollama.Client()
+                    except Exception as e:
+                        self._ollama_error = e
+        return self._ollama_client
+
     def _narrate_from_tile_async(self, payload: dict, event_id: Optional[int]) -> None:
-        threading.Thread(target=self._narrate_from_tile, args=(payload, event_id), daemon=True).start()
+        previous = self._latest_narration
+        if previous is not None:
+            previous.cancel()  # no-op once it is running; skips a stale position otherwise
+        self._latest_narration = self._llm_pool.submit(self._narrate_from_tile, payload, event_id)
 
     def _narrate_from_tile(self, payload: dict, event_id: Optional[int]) -> None:
         if not self.llm_enabled:
             return
-        try:
-            import ollama  # type: ignore
-        except Exception as e:
+        client = self.ollama_client
+        if client is None:
             # Schedule UI update on main thread
             try:
-                self.call_from_thread(self._error, f"LLM disabled — install ollama or set OLLAMA_MODEL. {e}")
+                self.call_from_thread(self._error, f"LLM disabled — install ollama or set OLLAMA_MODEL. {self._ollama_error}")
             except Exception:
                 pass
             return
@@ -259,11 +597,13 @@ class GameTUI(App):
         # Build a concise grounding prompt
         tile = payload.get("tile", {})
         pos = payload.get("position", {})
-        exits = ", ".join(tile.get("exits", payload.get("exits", [])))
-        entities = ", ".join([e.get("kind", e.get("name", "")) for e in tile.get("entities", [])])
-        items = ", ".join([i.get("kind", "") for i in tile.get("items", [])])
-        hazards = ", ".join(tile.get("hazards", []))
-        facts = payload.get("salient_facts", [])
+        # () defaults skip allocating a list on a miss; join takes the list
+        # comps as-is, where a generator would be copied into one first
+        exits = ", ".join(tile["exits"] if "exits" in tile else payload.get("exits", ()))
+        entities = ", ".join([e.get("kind") or e.get("name", "") for e in tile.get("entities", ())])
+        items = ", ".join([i.get("kind", "") for i in tile.get("items", ())])
+        hazards = ", ".join(tile.get("hazards", ()))
+        facts = payload.get("salient_facts", ())
         brief_parts = []
         if exits:
             brief_parts.append(f"Exits: {exits}")
@@ -276,46 +616,51 @@ class GameTUI(App):
         brief = "; ".join(brief_parts)
 
         max_words = int(payload.get("max_narrative_words", 500) or 500)
+        key = (max_words, tuple(pos.items()) if isinstance(pos, dict) else repr(pos))
+        cached = self._narrate_system_cache
+        if cached is None or cached[0] != key:
+            cached = self._narrate_system_cache = (
+                key,
+                {
+                    "role": "system",
+                    "content": (
+                        f"You are a Dungeon Master. In up to {max_words} words, vividly describe what the player perceives at position {pos}. "
+                        "Include the listed points of interest without inventing new exits/items/entities/hazards."
+                    ),
+                },
+            )
         messages = [
-            {
-                "role": "system",
-                "content": (
-                    f"You are a Dungeon Master. In up to {max_words} words, vividly describe what the player perceives at position {pos}. "
-                    "Include the listed points of interest without inventing new exits/items/entities/hazards."
-                ),
-            },
+            cached[1],
             {
                 "role": "user",
                 "content": (
                     ("Environment: " + brief if brief else "Environment: (none)")
                     + "\nPoints of Interest:\n - "
-                    + "\n - ".join(facts or [])
+                    + "\n - ".join(facts or ())
                 ),
             },
         ]
 
-        client = ollama.Client()
         start = time.time()
         try:
             resp = client.chat(
                 model=self.llm_model,
                 messages=messages,
                 options={"num_predict": max(256, min(3072, max_words * 2)), "temperature": 0.8},
+                stream=True,
             )
-            text = resp.get("message", {}).get("content", "")
+            # Rendered as it streams, with a blank line before it to separate it from tool output
+            text = self._stream_reply(resp)
+            if self._shutting_down.is_set():
+                return  # cut off by unmount; there is no UI left to report to
             elapsed = int((time.time() - start) * 1000)
             # Schedule UI updates on the main thread
             try:
                 self.call_from_thread(self._info, f"Narrative generated in {elapsed} ms")
-                # add a blank line between tool output and LLM narrative and print readable text
-                self.call_from_thread(self._print_narrative, text)
             except Exception:
                 pass
             if event_id is not None:
-                try:
-                    self.client.log(text, event_id)
-                except Exception:
-                    pass
+                self._log_q.put((payload.get("session_id"), text, event_id))
         except Exception as e:
             try:
                 self.call_from_thread(self._error, f"LLM error: {e}")
@@ -325,20 +670,41 @@ class GameTUI(App):
     # ---------- Free-form chat (LLM) ----------
 
     def _chat_from_text_async(self, user_text: str) -> None:
-        threading.Thread(target=self._chat_from_text, args=(user_text,), daemon=True).start()
+        self._chat_pending.append(user_text)
+        if not self._chat_busy:
+            self._next_chat()
+
+    def _next_chat(self) -> None:
+        # chat_history is only touched on the UI thread; the worker gets a copy
+        # that already holds every earlier exchange
+        if not self._chat_pending:
+            self._chat_busy = False
+            return
+        self._chat_busy = True
+        self._llm_pool.submit(self._chat_worker, self._chat_pending.popleft(), tuple(self.chat_history))
 
-    def _chat_from_text(self, user_text: str) -> None:
+    def _chat_worker(self, user_text: str, history: tuple) -> None:
+        try:
+            self._chat_from_text(user_text, history)
+        finally:
+            # Queued after _remember_chat, so the next chat sees this exchange
+            if not self._shutting_down.is_set():
+                try:
+                    self.call_from_thread(self._next_chat)
+                except Exception:
+                    pass
+
+    def _chat_from_text(self, user_text: str, history: tuple = ()) -> None:
         if not self.llm_enabled:
             try:
                 self.call_from_thread(self._info, "LLM is OFF — enable with :llm on")
             except Exception:
                 pass
             return
-        try:
-            import ollama  # type: ignore
-        except Exception as e:
+        client = self.ollama_client
+        if client is None:
             try:
-                self.call_from_thread(self._error, f"LLM disabled — install ollama or set OLLAMA_MODEL. {e}")
+                self.call_from_thread(self._error, f"LLM disabled — install ollama or set OLLAMA_MODEL. {self._ollama_error}")
             except Exception:
                 pass
             return
@@ -350,75 +716,88 @@ class GameTUI(App):
             pass
 
         # Build conversation with optional grounding from last_tile
-        history = list(self.chat_history)
-        history.append({"role": "user", "content": user_text})
+        user_msg = {"role": "user", "content": user_text}
 
-        grounding = ""
+        last_tile = self.last_tile
         max_words = 500
-        if self.last_tile:
-            exits = ", ".join(self.last_tile.get("exits", []))
-            facts = "; ".join(self.last_tile.get("salient_facts", [])[:3])
-            grounding = (
-                "Narrate vividly but stay consistent with tool facts. Current tile exits: "
-                + exits
-                + ". Salient facts: "
-                + facts
-                + "."
-            )
-            if isinstance(self.last_tile.get("max_narrative_words"), int):
-                try:
-                    max_words = int(self.last_tile.get("max_narrative_words") or 500)
-                except Exception:
-                    max_words = 500
-
-        messages = [
-            {
+        if last_tile and isinstance(last_tile.get("max_narrative_words"), int):
+            max_words = int(last_tile["max_narrative_words"] or 500)
+        # move/look replace last_tile (combat only edits its "combat" key), so
+        # identity plus max_words says whether the grounding is still current
+        cached = self._grounding_cache
+        if cached is None or cached[0] is not last_tile or cached[1] != max_words:
+            grounding = None
+            if last_tile:
+                exits = ", ".join(last_tile.get("exits", ()))
+                facts = "; ".join(last_tile.get("salient_facts", ())[:3])
+                grounding = {
+                    "role": "system",
+                    "content": (
+                        "Narrate vividly but stay consistent with tool facts. Current tile exits: "
+                        + exits
+                        + ". Salient facts: "
+                        + facts
+                        + "."
+                    ),
+                }
+            cached = self._grounding_cache = (last_tile, max_words, grounding)
+        grounding = cached[2]
+
+        system = self._system_cache.get(max_words)
+        if system is None:
+            system = self._system_cache[max_words] = {
                 "role": "system",
                 "content": (
                     f"You are a fantasy creative writer DM. Keep responses under {max_words} words and ground answers in provided tool facts when available."
                 ),
             }
-        ]
+        messages = [system]
         if grounding:
-            messages.append({"role": "system", "content": grounding})
+            messages.append(grounding)
         messages.extend(history)
+        messages.append(user_msg)
 
         predict_tokens = int(max(256, min(2048, int(max_words * 1.6))))
 
         start = time.time()
         try:
-            client = ollama.Client()  # type: ignore[name-defined]
             resp = client.chat(
                 model=self.llm_model,
                 messages=messages,
                 options={"num_predict": predict_tokens, "temperature": 0.8},
+                stream=True,
             )
-            text = resp.get("message", {}).get("content", "")
+            text = self._stream_reply(resp)
+            if self._shutting_down.is_set():
+                return
             elapsed = int((time.time() - start) * 1000)
             try:
                 self.call_from_thread(self._info, f"Narrative generated in {elapsed} ms")
-                self.call_from_thread(self._print_narrative, text)
             except Exception:
                 pass
-            # Persist chat history
-            self.chat_history = history
-            self.chat_history.append({"role": "assistant", "content": text})
+            self.call_from_thread(self._remember_chat, user_msg, {"role": "assistant", "content": text})
         except Exception as e:
             try:
                 self.call_from_thread(self._error, f"LLM error: {e}")
             except Exception:
                 pass
 
+    def _remember_chat(self, user_msg: dict, reply_msg: dict) -> None:
+        # Persist chat history on the UI thread; the deque drops the oldest turn
+        self.chat_history.extend((user_msg, reply_msg))
+
     def _render_actions(self) -> None:
-        lines: List[str] = ["[b]Actions[/]"]
-        for spec in self.router.list_specs():
-            kb = f" — {spec.shortcut}" if spec.shortcut else ""
-            lines.append(f":{spec.name} — {spec.help}{kb}")
-        self.query_one("#actions", Actions).update("\n".join(lines))
+        if self._actions_text is None:
+            lines: List[str] = ["[b]Actions[/]"]
+            for spec in self.router.list_specs():
+                kb = f" — {spec.shortcut}" if spec.shortcut else ""
+                lines.append(f":{spec.name} — {spec.help}{kb}")
+            self._actions_text = "\n".join(lines)
+        self.actions_widget.update(self._actions_text)
 
     def _render_context(self) -> None:
         if not self.last_tile:
-            self.query_one("#context", Context).update("[b]Context[/]\n(no tile yet)\nTry :start or :look")
+            self.context_widget.update("[b]Context[/]\n(no tile yet)\nTry :start or :look")
             return
         tile = self.last_tile.get("tile", {})
         ents = tile.get("entities", [])
@@ -439,7 +818,7 @@ class GameTUI(App):
             ctx_lines.append("[b]Items[/]:")
             for i in items[:5]:
                 ctx_lines.append(f" - {i.get('kind')}")
-        self.query_one("#context", Context).update("\n".join(ctx_lines))
+        self.context_widget.update("\n".join(ctx_lines))
 
     # ---------- Input handling ----------
 
@@ -450,11 +829,10 @@ class GameTUI(App):
             return
         # remember typed command for status area display
         self._last_command = text
-        self.status.update(f"[bold]You:[/] {text}")
+        self._set_status(f"[bold]You:[/] {text}")
         # Dice shortcuts are handled here
         if text.startswith("!roll ") or text.startswith("!roll-a "):
             try:
-                from tools.dnd_tools import roll_dice, roll_with_advantage
                 if text.startswith("!roll-a "):
                     notation = text.split(" ", 1)[1]
                     adv = roll_with_advantage(notation)
@@ -469,7 +847,10 @@ class GameTUI(App):
             return
 
         try:
-            handled = self.router.dispatch(text)
+            # A command typically updates status, transcript and context;
+            # let Textual repaint once for all of them
+            with self._batch():
+                handled = self.router.dispatch(text)
             if not handled:
                 # Free-form chat: generate narrative via LLM and render in center transcript
                 self._chat_from_text_async(text)
@@ -481,7 +862,7 @@ class GameTUI(App):
     def _cmd_start(self, _: str) -> None:
         payload = self.client.start()
         self.last_tile = payload
-        self.chat_history = []
+        self.chat_history.clear()
         self._info(f"Session started: {payload['session_id']}")
         self._print_tile(payload)
         if self.raw_enabled:
@@ -499,7 +880,7 @@ class GameTUI(App):
         if self.raw_enabled:
             self._json_block("Raw payload", res)
         self.last_tile = None
-        self.chat_history = []
+        self.chat_history.clear()
         self._render_context()
 
     def _cmd_reset(self, _: str) -> None:
@@ -507,7 +888,7 @@ class GameTUI(App):
         self._info("Reset all sessions")
         # no payload returned worth printing here
         self.last_tile = None
-        self.chat_history = []
+        self.chat_history.clear()
         self._render_context()
 
     def _cmd_move(self, arg: str) -> None:
@@ -564,7 +945,6 @@ class GameTUI(App):
             self._error("Usage: :roll NdM or dM")
             return
         try:
-            from tools.dnd_tools import roll_dice
             res = roll_dice(val)
             self._info(f"Dice {res['notation']}: rolls={res['rolls']} total={res['total']}")
         except Exception as e:
@@ -594,50 +974,37 @@ class GameTUI(App):
 
     def _cmd_attack(self, arg: str) -> None:
         # Expect: "weapon" "NdM" [adv|dis]
-        weapon = "attack"
-        dmg = "1d6"
-        adv = False
-        dis = False
-        s = arg.strip()
+        # The weapon is only taken when quoted, so ":attack 1d8 adv" still
+        # means the default weapon with 1d8 damage
+        s = (arg or "").strip()
         try:
-            if s.startswith('"'):
-                idx = s.find('"', 1)
-                weapon = s[1:idx]
-                s = s[idx+1:].strip()
-            parts = s.split()
-            if parts:
-                if parts[0].startswith('"'):
-                    idx = s.find('"', 1)
-                    dmg = s[1:idx]
-                    rest = s[idx+1:].strip()
-                else:
-                    dmg = parts[0]
-                    rest = " ".join(parts[1:]) if len(parts) > 1 else ""
-                flag = (rest or "").lower()
-                if flag in {"adv", "advantage"}: adv = True
-                if flag in {"dis", "disadvantage"}: dis = True
-        except Exception:
-            pass
+            tokens = shlex.split(s)
+        except ValueError:  # unbalanced quote
+            tokens = s.split()
+        weapon = tokens.pop(0) if s.startswith('"') and tokens else "attack"
+        dmg = tokens[0] if tokens else "1d6"
+        flag = " ".join(tokens[1:]).lower()
+        adv = flag in {"adv", "advantage"}
+        dis = flag in {"dis", "disadvantage"}
         try:
             payload = self.client.attack(weapon, dmg, advantage=adv, disadvantage=dis)
             msg = payload.get("message", "")
             # Status line summary
             self._info("Attack resolved")
             # Center transcript readable block
-            self.transcript.write("")
-            self.transcript.write("[b]🗡️  Attack[/]")
+            lines = ["", "[b]🗡️  Attack[/]"]
             if msg:
-                for line in msg.splitlines():
-                    self.transcript.write(line)
+                lines.extend(msg.splitlines())
             # Print enemy HP summary if present
             combat = payload.get("combat") if isinstance(payload, dict) else None
             if combat and combat.get("enemies"):
-                self.transcript.write("Enemies:")
+                lines.append("Enemies:")
                 for e in combat.get("enemies", [])[:4]:
-                    self.transcript.write(
+                    lines.append(
                         f" - {e.get('name', e.get('kind'))} HP {e.get('hp')}/{e.get('max_hp')} AC {e.get('armor_class')}"
                     )
-            self.transcript.write("")
+            lines.append("")
+            self._write_block(lines)
             self.last_tile = payload
             if self.raw_enabled:
                 self._json_block("Raw payload", payload)
@@ -645,10 +1012,7 @@ class GameTUI(App):
         except Exception as e:
             self._error(str(e))
             # Also echo to transcript for visibility
-            self.transcript.write("")
-            self.transcript.write("[b]🗡️  Attack[/]")
-            self.transcript.write(f"❌ {e}")
-            self.transcript.write("")
+            self._write_block(["", "[b]🗡️  Attack[/]", f"❌ {e}", ""])
 
     def _cmd_combat(self, arg: str) -> None:
         a = (arg or "").strip().lower()
@@ -690,28 +1054,36 @@ class GameTUI(App):
             self._error(str(e))
 
     def _cmd_journal(self, _: str) -> None:
-        res = self.client.journal()
+        # Fetched by the log worker once the narratives queued ahead of it are
+        # recorded, so the journal includes them without blocking the UI
+        self._log_q.put(self._fetch_journal)
+
+    def _fetch_journal(self) -> None:
+        try:
+            res = self.client.journal()
+        except Exception as e:
+            self.call_from_thread(self._error, str(e))
+            return
+        self.call_from_thread(self._show_journal, res)
+
+    def _show_journal(self, res: dict) -> None:
         lines = res.get("summary", [])
         if not lines:
             self._info("Journal is empty")
         else:
-            self.transcript.write("")
-            self.transcript.write("[b]📜 Journal[/]")
-            for ln in lines:
-                self.transcript.write(f" - {ln}")
-            self.transcript.write("")
+            self._write_block(["", "[b]📜 Journal[/]", *(f" - {ln}" for ln in lines), ""])
         if self.raw_enabled:
             self._json_block("Raw payload", res)
 
     def _cmd_sessions(self, _: str) -> None:
         res = self.client.sessions()
-        self.transcript.write("")
-        self.transcript.write("[b]🗂️  Sessions[/]")
+        lines = ["", "[b]🗂️  Sessions[/]"]
         for s in res.get("sessions", []):
             mark = "*" if s.get("active") else " "
             pos = s.get("position", {})
-            self.transcript.write(f" {mark} {s['session_id']} @ {pos} turn={s.get('turn')} heading={s.get('heading')}")
-        self.transcript.write("")
+            lines.append(f" {mark} {s['session_id']} @ {pos} turn={s.get('turn')} heading={s.get('heading')}")
+        lines.append("")
+        self._write_block(lines)
         if self.raw_enabled:
             self._json_block("Raw payload", res)
 